@@ -1,23 +1,32 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
 from datetime import datetime, date, timedelta
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import time
+import hashlib
+import re
+import uuid
+from summary_cache import SummaryCache
+from write_queue import WriteQueue
+from journal import TransactionJournal, JournalSyncWorker
+from ledger import LedgerPager, filter_page
+from metrics import Metrics
+from archive import TransactionArchive
+from prefetch import SummaryPrefetcher
+from reconcile import SummaryReconciler
+from resilience import RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenError
+from wire import WireCodec
 
-# Cấu hình trang
-st.set_page_config(
-    page_title="Quản lý Thu Chi Cá Nhân",
-    page_icon="💰",
-    layout="wide"
-)
+# pandas, numpy, pyarrow và các module dùng chúng chỉ được import khi cần
+# (báo cáo, nhập file, lưu trữ) để lần chạy đầu tiên hiển thị nhanh hơn
 
-# Khởi tạo session state
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = None
-if 'cached_summary' not in st.session_state:
-    st.session_state.cached_summary = None
+@st.cache_resource
+def get_metrics():
+    """Số liệu đo đạc (request, retry, cache, thời gian từng pha) dùng chung cho process"""
+    return Metrics()
 
 # Lấy URL từ environment variable hoặc input của user
 def get_sheet_url():
@@ -41,9 +50,8 @@ def get_sheet_url():
             
     return sheet_url
 
-SHEET_URL_KEY = get_sheet_url()
-
-if not SHEET_URL_KEY:
+def render_setup_help():
+    """Hướng dẫn khi chưa có Google Apps Script URL"""
     st.error("❌ Vui lòng cung cấp Google Apps Script URL")
     st.info("💡 **Hướng dẫn thiết lập:**")
     st.markdown("""
@@ -55,7 +63,9 @@ if not SHEET_URL_KEY:
        - Who has access: **Anyone**
     4. Copy URL và paste vào ô bên trái
     """)
-    st.stop()
+
+# URL từ environment variable; khi chạy UI, main() có thể lấy thêm từ sidebar
+SHEET_URL_KEY = os.getenv('SHEET_URL_KEY')
 
 # Danh mục thu chi
 INCOME_CATEGORIES = ["Lương", "Thưởng", "Kinh doanh", "Đầu tư", "Khác"]
@@ -75,11 +85,14 @@ EXPENSE_CATEGORIES = [
     "Khác"
 ]
 
+MAX_AMOUNT = 1000000000  # 1 tỷ
+MIN_DATE = date(2020, 1, 1)
+
 def validate_amount(amount):
     """Kiểm tra tính hợp lệ của số tiền"""
     if amount <= 0:
         return False, "Số tiền phải lớn hơn 0"
-    if amount > 1000000000:  # 1 tỷ
+    if amount > MAX_AMOUNT:
         return False, "Số tiền quá lớn (tối đa 1 tỷ VNĐ)"
     return True, ""
 
@@ -88,67 +101,223 @@ def validate_date(input_date):
     today = date.today()
     if input_date > today:
         return False, "Không thể chọn ngày trong tương lai"
-    if input_date < date(2020, 1, 1):
+    if input_date < MIN_DATE:
         return False, "Ngày không hợp lệ (từ năm 2020 trở lên)"
     return True, ""
 
+def validate_amounts(amounts):
+    """Phiên bản vector hóa của validate_amount: trả về Series thông báo lỗi ('' nếu hợp lệ)"""
+    import numpy as np
+    import pandas as pd
+    messages = np.select(
+        [amounts.isna(), amounts <= 0, amounts > MAX_AMOUNT],
+        ["Số tiền không hợp lệ", "Số tiền phải lớn hơn 0", "Số tiền quá lớn (tối đa 1 tỷ VNĐ)"],
+        default=""
+    )
+    return pd.Series(messages, index=amounts.index)
+
+def validate_dates(dates):
+    """Phiên bản vector hóa của validate_date cho Series datetime"""
+    import numpy as np
+    import pandas as pd
+    messages = np.select(
+        [dates.isna(), dates.dt.date > date.today(), dates.dt.date < MIN_DATE],
+        ["Ngày không hợp lệ", "Không thể chọn ngày trong tương lai", "Ngày không hợp lệ (từ năm 2020 trở lên)"],
+        default=""
+    )
+    return pd.Series(messages, index=dates.index)
+
+# Cấu hình HTTP client dùng chung (có thể chỉnh qua environment variable)
+HTTP_POOL_SIZE = int(os.getenv('SHEET_POOL_SIZE', '10'))
+CONNECT_TIMEOUT = 10
+READ_TIMEOUTS = {
+    "test_connection": 30,
+    "send": 60,
+    "summary": 45
+}
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': 'StreamlitApp/1.0',
+    'Accept': 'application/json'
+}
+
+@st.cache_resource
+def get_http_session(pool_size=HTTP_POOL_SIZE):
+    """Tạo HTTP session dùng chung cho cả process (giữ kết nối keep-alive)"""
+    session = requests.Session()
+    # Apps Script redirect sang googleusercontent.com nên cần pool cho ít nhất 2 host
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+# Định dạng truyền: "auto" hỏi server qua get_capabilities và dùng bảng cột + gzip nếu
+# server hỗ trợ, "json" luôn gửi JSON thường
+WIRE_FORMAT = os.getenv('WIRE_FORMAT', 'auto')
+WIRE_GZIP_MIN_BYTES = int(os.getenv('WIRE_GZIP_MIN_BYTES', '1024'))
+
+@st.cache_resource
+def get_wire_codec(sheet_url):
+    """Bộ mã hóa request/response theo định dạng server hỗ trợ, dùng chung cho mỗi URL deploy"""
+    def fetch_capabilities():
+        response = post_to_sheet({"action": "get_capabilities"}, "test_connection", sheet_url)
+        # Lỗi tạm thời (429, 5xx...) không có nghĩa là server cũ: ném lỗi để hỏi lại sau
+        response.raise_for_status()
+        # Server cũ không biết action này và không trả về capabilities
+        try:
+            return response.json().get('capabilities', [])
+        except ValueError:
+            return []
+    return WireCodec(fetch_capabilities, enabled=WIRE_FORMAT == 'auto', min_gzip_bytes=WIRE_GZIP_MIN_BYTES)
+
+def read_response(response, sheet_url=None):
+    """Đọc body JSON của response (mở phong bì gzip và bảng cột nếu có)"""
+    return get_wire_codec(sheet_url or SHEET_URL_KEY).decode(response.json())
+
+def post_to_sheet(data, timeout_key, sheet_url=None):
+    """Gửi request POST đến Google Apps Script qua session dùng chung.
+    
+    sheet_url mặc định là URL của lần chạy hiện tại; các luồng nền dùng chung cho
+    process (hàng đợi ghi, đối chiếu) phải truyền URL của chính giao dịch/báo cáo.
+    """
+    sheet_url = sheet_url or SHEET_URL_KEY
+    session = get_http_session()
+    metrics = get_metrics()
+    action = data.get('action', 'unknown')
+    if action == 'get_capabilities':
+        body = json.dumps(data).encode('utf-8')
+    else:
+        body = get_wire_codec(sheet_url).encode(data)
+    start = time.perf_counter()
+    try:
+        response = session.post(
+            sheet_url,
+            data=body,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUTS[timeout_key])
+        )
+    except requests.exceptions.Timeout:
+        metrics.record_request(action, time.perf_counter() - start, "timeout")
+        raise
+    except requests.exceptions.RequestException:
+        metrics.record_request(action, time.perf_counter() - start, "error")
+        raise
+    
+    metrics.record_request(action, time.perf_counter() - start, response.status_code)
+    return response
+
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', '300'))
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '32'))
+
+@st.cache_resource
+def get_summary_cache():
+    """Cache báo cáo dùng chung cho mọi session trong process"""
+    return SummaryCache(ttl=SUMMARY_CACHE_TTL, max_size=SUMMARY_CACHE_SIZE)
+
+def summary_cache_key(sheet_name, sheet_url=None):
+    """Key cache theo URL deploy và tên sheet"""
+    return (sheet_url or SHEET_URL_KEY, sheet_name)
+
+def get_pool_stats():
+    """Thống kê số kết nối đã mở và số request đã gửi qua connection pool"""
+    session = get_http_session()
+    stats = {"connections": 0, "requests": 0}
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    stats["reuse_ratio"] = stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+    return stats
+
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '5'))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', '30'))
+
+@st.cache_resource
+def get_retry_policy(sheet_url):
+    """Chính sách retry và circuit breaker dùng chung trong process cho mỗi URL deploy"""
+    return RetryPolicy(
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        budget=RetryBudget(ratio=RETRY_BUDGET_RATIO),
+        breaker=CircuitBreaker(failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET)
+    )
+
+def request_with_policy(data, timeout_key, sheet_url=None):
+    """Gửi request qua chính sách retry dùng chung (backoff, Retry-After, ngân sách, breaker)"""
+    action = data.get('action')
+    sheet_url = sheet_url or SHEET_URL_KEY
+    return get_retry_policy(sheet_url).execute(
+        lambda: post_to_sheet(data, timeout_key, sheet_url),
+        retry_exceptions=(requests.exceptions.Timeout, requests.exceptions.ConnectionError),
+        on_retry=lambda delay: get_metrics().record_retry(action, delay)
+    )
+
+def get_resilience_stats():
+    """Trạng thái circuit breaker và ngân sách retry hiện tại"""
+    policy = get_retry_policy(SHEET_URL_KEY)
+    return {
+        "breaker_state": policy.breaker.state,
+        "breaker_retry_in_s": round(policy.breaker.retry_in(), 1),
+        "retry_budget_tokens": round(policy.budget.tokens, 2)
+    }
+
+def circuit_open_message(error):
+    return f"⛔ Google Apps Script đang lỗi liên tục, tạm ngưng gửi request (thử lại sau {error.retry_in:.0f}s)"
+
 def test_connection():
     """Test kết nối với Google Apps Script"""
     try:
         data = {"action": "test_connection"}
-        response = requests.post(
-            SHEET_URL_KEY, 
-            json=data, 
-            timeout=30,
-            headers={
-                'Content-Type': 'application/json',
-                'User-Agent': 'StreamlitApp/1.0'
-            }
-        )
+        response = request_with_policy(data, "test_connection")
         
         if response.status_code == 200:
             return True, "✅ Kết nối thành công!"
         else:
             return False, f"❌ Lỗi kết nối: {response.status_code} - {response.text[:200]}"
-            
+    
+    except CircuitOpenError as e:
+        return False, circuit_open_message(e)
     except Exception as e:
         return False, f"❌ Lỗi kết nối: {str(e)}"
 
-def send_to_sheet(data):
-    """Gửi dữ liệu đến Google Apps Script với xử lý lỗi cải tiến"""
+def send_with_retries(data, sheet_url=None):
+    """Gửi request ghi dữ liệu có retry, trả về (thành công, thông báo, dữ liệu phản hồi)"""
+    sheet_url = sheet_url or SHEET_URL_KEY
     try:
-        with st.spinner('Đang gửi dữ liệu...'):
-            # Thêm retry mechanism
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = requests.post(
-                        SHEET_URL_KEY, 
-                        json=data, 
-                        timeout=60,
-                        headers={
-                            'Content-Type': 'application/json',
-                            'User-Agent': 'StreamlitApp/1.0',
-                            'Accept': 'application/json'
-                        }
-                    )
-                    
-                    # Detailed error handling
-                    if response.status_code == 200:
-                        try:
-                            response_data = response.json()
-                            if response_data.get('error'):
-                                return False, f"❌ Lỗi từ server: {response_data.get('message', 'Unknown error')}"
-                            
-                            # Reset cache khi có cập nhật
-                            st.session_state.last_update = time.time()
-                            st.session_state.cached_summary = None
-                            return True, "✅ Dữ liệu đã được cập nhật thành công!"
-                        except json.JSONDecodeError:
-                            return False, f"❌ Phản hồi không hợp lệ từ server"
-                            
-                    elif response.status_code == 401:
-                        return False, """
+        response = request_with_policy(data, "send", sheet_url)
+        
+        # Detailed error handling
+        if response.status_code == 200:
+            try:
+                response_data = read_response(response, sheet_url)
+                if response_data.get('error') or response_data.get('success') is False:
+                    return False, f"❌ Lỗi từ server: {response_data.get('message', 'Unknown error')}", None
+                
+                # Cập nhật ngay báo cáo của sheet vừa ghi; add_transactions được xử lý
+                # theo kết quả từng giao dịch trong send_batch_to_sheet
+                if data.get('action') == 'add_transaction':
+                    # Giao dịch server báo trùng id (gửi lại từ nhật ký) đã được tính trước đó
+                    if not response_data.get('duplicate'):
+                        apply_written_safely(data['sheet_name'], [data['transaction']], sheet_url)
+                elif data.get('sheet_name') and data.get('action') != 'add_transactions':
+                    get_summary_cache().invalidate(summary_cache_key(data['sheet_name'], sheet_url))
+                    get_archive(sheet_url).invalidate(data['sheet_name'])
+                return True, "✅ Dữ liệu đã được cập nhật thành công!", response_data
+            except ValueError:
+                return False, f"❌ Phản hồi không hợp lệ từ server", None
+        
+        elif response.status_code == 401:
+            return False, """
 ❌ **Lỗi 401 - Unauthorized**
 
 **Nguyên nhân có thể:**
@@ -161,100 +330,1206 @@ def send_to_sheet(data):
 3. Execute as: **Me**
 4. Who has access: **Anyone** 
 5. Deploy và copy URL mới
-                        """
-                    elif response.status_code == 403:
-                        return False, "🔒 Không có quyền truy cập. Kiểm tra cấu hình Google Apps Script"
-                    elif response.status_code == 404:
-                        return False, "❌ URL không tồn tại. Kiểm tra lại Google Apps Script URL"
-                    elif response.status_code == 429:
-                        if attempt < max_retries - 1:
-                            time.sleep(2 ** attempt)  # Exponential backoff
-                            continue
-                        return False, "⏰ Quá nhiều yêu cầu, vui lòng thử lại sau"
-                    else:
-                        return False, f"❌ Lỗi {response.status_code}: {response.text[:200]}"
-                        
-                except requests.exceptions.Timeout:
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
-                        continue
-                    return False, "⏰ Kết nối quá chậm, vui lòng thử lại"
-                except requests.exceptions.ConnectionError:
-                    if attempt < max_retries - 1:
-                        time.sleep(1)
-                        continue
-                    return False, "❌ Lỗi kết nối mạng"
-                    
-        return False, "❌ Không thể kết nối sau nhiều lần thử"
+            """, None
+        elif response.status_code == 403:
+            return False, "🔒 Không có quyền truy cập. Kiểm tra cấu hình Google Apps Script", None
+        elif response.status_code == 404:
+            return False, "❌ URL không tồn tại. Kiểm tra lại Google Apps Script URL", None
+        elif response.status_code == 429:
+            return False, "⏰ Quá nhiều yêu cầu, vui lòng thử lại sau", None
+        else:
+            return False, f"❌ Lỗi {response.status_code}: {response.text[:200]}", None
+    
+    except CircuitOpenError as e:
+        return False, circuit_open_message(e), None
+    except requests.exceptions.Timeout:
+        return False, "⏰ Kết nối quá chậm, vui lòng thử lại", None
+    except requests.exceptions.ConnectionError:
+        return False, "❌ Lỗi kết nối mạng", None
+    except Exception as e:
+        return False, f"❌ Lỗi không xác định: {str(e)[:100]}", None
+
+def send_to_sheet(data):
+    """Gửi dữ liệu đến Google Apps Script với xử lý lỗi cải tiến"""
+    with st.spinner('Đang gửi dữ liệu...'):
+        success, message, _ = send_with_retries(data)
+    return success, message
+
+def send_batch_to_sheet(sheet_name, transactions, sheet_url=None):
+    """Gửi nhiều giao dịch trong một request add_transactions, trả về kết quả từng giao dịch"""
+    data = {
+        "action": "add_transactions",
+        "sheet_name": sheet_name,
+        "transactions": transactions
+    }
+    sheet_url = sheet_url or SHEET_URL_KEY
+    success, message, response_data = send_with_retries(data, sheet_url)
+    if not success:
+        return [(False, message)] * len(transactions)
+
+    # Server trả về danh sách results theo đúng thứ tự; thiếu hoặc sai số lượng thì không
+    # biết giao dịch nào đã được ghi, coi cả batch là lỗi (gửi lại an toàn nhờ id)
+    item_results = response_data.get('results')
+    if not isinstance(item_results, list) or len(item_results) != len(transactions):
+        return [(False, "❌ Server không trả về kết quả cho từng giao dịch")] * len(transactions)
+
+    results = []
+    written = []
+    for transaction, item in zip(transactions, item_results):
+        if not isinstance(item, dict) or item.get('error') or item.get('success') is False:
+            item = item if isinstance(item, dict) else {}
+            results.append((False, f"❌ Lỗi từ server: {item.get('message', 'Unknown error')}"))
+        else:
+            results.append((True, message))
+            # Giao dịch trùng id (gửi lại sau timeout) đã có trên server và đã được tính
+            if not item.get('duplicate'):
+                written.append(transaction)
+    apply_written_safely(sheet_name, written, sheet_url)
+    return results
+
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', '20'))
+WRITE_BATCH_WAIT = float(os.getenv('WRITE_BATCH_WAIT', '0.5'))
+
+@st.cache_resource
+def get_write_queue():
+    """Hàng đợi ghi dùng chung, gộp giao dịch từ mọi session thành batch"""
+    return WriteQueue(
+        send_batch_to_sheet,
+        max_batch_size=WRITE_BATCH_SIZE,
+        max_wait=WRITE_BATCH_WAIT
+    )
+
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', 'money_journal.db')
+JOURNAL_SYNC_INTERVAL = float(os.getenv('JOURNAL_SYNC_INTERVAL', '5'))
+
+@st.cache_resource
+def get_journal():
+    """Nhật ký giao dịch cục bộ dùng chung cho process"""
+    # Giao dịch ghi trước khi nhật ký lưu URL được gán cho URL cấu hình qua biến môi trường
+    return TransactionJournal(JOURNAL_PATH, default_url=os.getenv('SHEET_URL_KEY'))
+
+@st.cache_resource
+def get_sync_worker():
+    """Worker nền đồng bộ nhật ký lên Google Apps Script qua hàng đợi ghi.
+    
+    Mỗi giao dịch được gửi đến URL deploy lưu cùng dòng nhật ký, không phải URL của
+    session đã tạo worker.
+    """
+    return JournalSyncWorker(
+        get_journal(),
+        get_write_queue().submit,
+        interval=JOURNAL_SYNC_INTERVAL,
+        # Không đẩy nhật ký khi circuit breaker của URL đang mở để không tiêu lượt thử của giao dịch
+        paused=lambda sheet_url: get_retry_policy(sheet_url).breaker.retry_in() > 0
+    )
+
+def submit_transaction(sheet_name, transaction):
+    """Ghi giao dịch vào nhật ký cục bộ rồi để worker nền đồng bộ lên server"""
+    try:
+        entry_id = get_journal().append(sheet_name, transaction, SHEET_URL_KEY)
+    except Exception as e:
+        return False, f"❌ Không thể lưu giao dịch: {str(e)[:100]}", None
+
+    get_sync_worker().notify()
+    return True, "✅ Đã lưu giao dịch, đang đồng bộ lên Google Sheet", entry_id
+
+def sync_entries(ids):
+    """Đồng bộ nhật ký đến khi các giao dịch ids xong hoặc không còn tiến triển, trả về trạng thái"""
+    journal = get_journal()
+    worker = get_sync_worker()
+    while worker.sync_once():
+        statuses = journal.statuses(ids)
+        if all(entry["status"] != "pending" for entry in statuses.values()):
+            break
+    return journal.statuses(ids)
+
+SHEET_NAME_PATTERN = re.compile(r"(0[1-9]|1[0-2])/\d{4}")
+
+def parse_transaction(item):
+    """Kiểm tra một giao dịch dạng dict (date, type, category, amount, note, sheet_name, id).
+    
+    Trả về (thành công, thông báo lỗi, (sheet_name, giao dịch đã chuẩn hóa)).
+    """
+    try:
+        transaction_date = date.fromisoformat(str(item.get('date', ''))[:10])
+    except ValueError:
+        return False, "Ngày không hợp lệ (định dạng YYYY-MM-DD)", None
+    try:
+        amount = float(item.get('amount'))
+    except (TypeError, ValueError):
+        return False, "Số tiền không hợp lệ", None
+    
+    for is_valid, message in [validate_amount(amount), validate_date(transaction_date)]:
+        if not is_valid:
+            return False, message, None
+    
+    transaction_type = item.get('type')
+    categories = {"Thu": INCOME_CATEGORIES, "Chi": EXPENSE_CATEGORIES}.get(transaction_type)
+    if categories is None:
+        return False, "Loại giao dịch phải là Thu hoặc Chi", None
+    category = item.get('category') or "Khác"
+    if category not in categories:
+        return False, f"Danh mục không hợp lệ: {category}", None
+    
+    transaction = {
+        "date": transaction_date.strftime("%Y-%m-%d"),
+        "type": transaction_type,
+        "category": category,
+        "amount": int(amount),
+        "note": str(item.get('note') or '').strip()[:200]
+    }
+    sheet_name = item.get('sheet_name') or transaction_date.strftime("%m/%Y")
+    if not SHEET_NAME_PATTERN.fullmatch(str(sheet_name)):
+        return False, f"Tên sheet không hợp lệ (định dạng MM/YYYY): {sheet_name}", None
+    return True, "", (sheet_name, transaction)
+
+INGEST_CHUNK_SIZE = 1000
+
+def ingest_transactions(items, wait=True):
+    """Nhập nhiều giao dịch (không qua giao diện) qua nhật ký cục bộ và đường ghi theo batch.
+    
+    Giao dịch có trường `id` dùng id đó làm idempotency key (gửi lại không tạo dòng trùng).
+    Trả về danh sách kết quả theo thứ tự đầu vào: index, id, sheet_name, status, message.
+    """
+    journal = get_journal()
+    results = []
+    for start in range(0, len(items), INGEST_CHUNK_SIZE):
+        chunk_results = []
+        entries = []
+        for index, item in enumerate(items[start:start + INGEST_CHUNK_SIZE], start):
+            if isinstance(item, dict):
+                ok, message, parsed = parse_transaction(item)
+            else:
+                ok, message, parsed = False, "Giao dịch phải là JSON object", None
+            if not ok:
+                results.append({"index": index, "id": None, "sheet_name": None, "status": "invalid", "message": message})
+                continue
+            entry_id = str(item.get('id') or uuid.uuid4().hex)
+            sheet_name, transaction = parsed
+            entries.append((entry_id, sheet_name, transaction))
+            chunk_results.append({"index": index, "id": entry_id, "sheet_name": sheet_name})
+        
+        if not entries:
+            continue
+        journal.append_many(entries, SHEET_URL_KEY)
+        ids = [entry_id for entry_id, _, _ in entries]
+        if wait:
+            statuses = sync_entries(ids)
+        else:
+            get_sync_worker().notify()
+            statuses = journal.statuses(ids)
+        for result in chunk_results:
+            entry = statuses[result["id"]]
+            result.update(status=entry["status"], message=entry["last_error"] or "")
+        results.extend(chunk_results)
+    return sorted(results, key=lambda result: result["index"])
+
+def validate_import_rows(rows):
+    """Kiểm tra toàn bộ các dòng import, trả về Series thông báo lỗi ('' nếu hợp lệ)"""
+    errors = validate_amounts(rows["amount"])
+    errors = errors.mask(errors == "", validate_dates(rows["date"]))
+    return errors.mask((errors == "") & rows["type"].isna(), "Loại giao dịch không hợp lệ")
+
+def import_transactions(fileobj, mapping, dayfirst=True, progress=None):
+    """Nhập giao dịch từ file CSV theo từng khối qua nhật ký cục bộ và đường ghi theo batch.
+    
+    Mỗi dòng có id cố định theo nội dung file và số dòng, nên nhập lại cùng file
+    sẽ bỏ qua các dòng đã đồng bộ và tiếp tục các dòng còn dở.
+    """
+    import pandas as pd
+    from bulk_import import IMPORT_CHUNK_SIZE, file_fingerprint, read_chunks, normalize_chunk
+    journal = get_journal()
+    fingerprint, total_lines = file_fingerprint(fileobj)
+    results = []
+    processed = 0
+    
+    for chunk in read_chunks(fileobj, IMPORT_CHUNK_SIZE):
+        rows = normalize_chunk(chunk, mapping, INCOME_CATEGORIES, EXPENSE_CATEGORIES, dayfirst=dayfirst)
+        errors = validate_import_rows(rows)
+        
+        invalid = rows[errors != ""]
+        results.append(pd.DataFrame({
+            "row": invalid["row"],
+            "sheet_name": invalid["sheet_name"],
+            "status": "invalid",
+            "message": errors[errors != ""]
+        }))
         
+        valid = rows[errors == ""].copy()
+        if not valid.empty:
+            valid["date"] = valid["date"].dt.strftime("%Y-%m-%d")
+            valid["amount"] = valid["amount"].astype("int64")
+            ids = [f"import-{fingerprint[:16]}-{row}" for row in valid["row"]]
+            transactions = valid[["date", "type", "category", "amount", "note"]].to_dict("records")
+            journal.append_many(zip(ids, valid["sheet_name"], transactions), SHEET_URL_KEY)
+            statuses = sync_entries(ids)
+            results.append(pd.DataFrame({
+                "row": valid["row"].values,
+                "sheet_name": valid["sheet_name"].values,
+                "status": [statuses[entry_id]["status"] for entry_id in ids],
+                "message": [statuses[entry_id]["last_error"] or "" for entry_id in ids]
+            }))
+        
+        processed += len(chunk)
+        if progress:
+            progress(processed, max(total_lines - 1, processed))
+    
+    if not results:
+        return pd.DataFrame(columns=["row", "sheet_name", "status", "message"])
+    return pd.concat(results, ignore_index=True).sort_values("row")
+
+# Chế độ báo cáo: "server" (Apps Script tính sẵn) hoặc "local" (tính tại máy từ giao dịch thô)
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'server')
+
+TRANSACTIONS_PAGE_SIZE = int(os.getenv('TRANSACTIONS_PAGE_SIZE', '1000'))
+
+def request_transactions(sheet_name, cursor, limit=None, filters=None):
+    """Gọi get_transactions: các dòng kể từ cursor, tối đa limit dòng khớp bộ lọc"""
+    data = {
+        "action": "get_transactions",
+        "sheet_name": sheet_name,
+        "cursor": cursor
+    }
+    if limit:
+        data["limit"] = limit
+    if filters:
+        data["filters"] = filters
+    response = request_with_policy(data, "summary")
+    if response.status_code != 200:
+        raise ValueError(f"Lỗi {response.status_code}: Không thể tải giao dịch")
+
+    response_data = read_response(response)
+    if response_data.get('error'):
+        raise ValueError(f"Lỗi: {response_data.get('message', 'Unknown error')}")
+    return response_data
+
+def fetch_transactions(sheet_name, cursor):
+    """Tải các giao dịch thô của sheet kể từ vị trí cursor (theo từng trang)"""
+    rows = []
+    while True:
+        response_data = request_transactions(sheet_name, cursor, TRANSACTIONS_PAGE_SIZE)
+        page = response_data.get('transactions', [])
+        rows.extend(page)
+        cursor = response_data.get('next_cursor', cursor + len(page))
+        # Server chưa hỗ trợ phân trang (không có has_more) trả về toàn bộ trong một lần
+        if not response_data.get('has_more'):
+            return rows, cursor
+
+def fetch_ledger_page(sheet_name, cursor, limit, filters):
+    """Một trang sổ giao dịch: (các dòng, cursor trang sau, còn trang sau không)"""
+    response_data = request_transactions(sheet_name, cursor, limit, filters)
+    rows = response_data.get('transactions', [])
+    if 'has_more' not in response_data:
+        # Server cũ bỏ qua limit và bộ lọc: lọc và cắt trang tại máy
+        return filter_page(rows, cursor, limit, filters)
+    return rows, response_data.get('next_cursor', cursor + len(rows)), response_data['has_more']
+
+LEDGER_PAGE_SIZES = [25, 50, 100]
+
+@st.cache_resource
+def get_ledger_pager(sheet_url):
+    """Bộ tải sổ giao dịch theo trang, mỗi URL deploy một bộ riêng; tải trước trên một luồng nền"""
+    return LedgerPager(
+        fetch_ledger_page,
+        ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-prefetch"),
+        ttl=SUMMARY_CACHE_TTL
+    )
+
+@st.cache_resource
+def get_local_engine(sheet_url):
+    """Bộ tính báo cáo tại máy, mỗi URL deploy một bộ dữ liệu riêng"""
+    from local_summary import LocalSummaryEngine
+    return LocalSummaryEngine(fetch_transactions)
+
+def fetch_local_summary(sheet_name):
+    """Lấy báo cáo bằng cách đồng bộ phần giao dịch mới rồi tính tại máy"""
+    try:
+        return True, get_local_engine(SHEET_URL_KEY).summary(sheet_name)
+    except requests.exceptions.Timeout:
+        return False, "Timeout: Không thể tải giao dịch"
+    except json.JSONDecodeError:
+        return False, "Phản hồi không hợp lệ từ server"
     except Exception as e:
-        return False, f"❌ Lỗi không xác định: {str(e)[:100]}"
+        return False, f"Lỗi: {str(e)[:100]}"
 
-def get_summary_data(sheet_name):
-    """Lấy dữ liệu báo cáo với cache"""
-    # Kiểm tra cache (cache trong 5 phút)
-    if (st.session_state.cached_summary and 
-        st.session_state.last_update and 
-        time.time() - st.session_state.last_update < 300):
-        return True, st.session_state.cached_summary
+# Lưu trữ cột cục bộ cho các tháng đã qua
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', '1') == '1'
+ARCHIVE_SUMMARY_COLUMNS = ["type", "category", "amount"]
+
+@st.cache_resource
+def get_archive(sheet_url):
+    """Kho lưu trữ giao dịch, mỗi URL deploy một thư mục riêng"""
+    url_hash = hashlib.sha256(sheet_url.encode('utf-8')).hexdigest()[:12]
+    return TransactionArchive(os.path.join(ARCHIVE_DIR, url_hash))
+
+def is_closed_month(sheet_name):
+    """Tháng của sheet đã kết thúc (trước tháng hiện tại)"""
+    month, year = (int(part) for part in sheet_name.split('/'))
+    today = date.today()
+    return (year, month) < (today.year, today.month)
+
+def fetch_archived_summary(sheet_name):
+    """Tính báo cáo tháng cũ từ kho lưu trữ; lần đầu tải giao dịch thô về và lưu lại"""
+    from local_summary import compute_summary
+    archive = get_archive(SHEET_URL_KEY)
+    archived = archive.has(sheet_name)
+    get_metrics().record_cache("archive", archived)
     
+    try:
+        if not archived:
+            rows, _ = fetch_transactions(sheet_name, 0)
+            archive.write(sheet_name, rows)
+        df = archive.read([sheet_name], columns=ARCHIVE_SUMMARY_COLUMNS)
+        return True, compute_summary(df)
+    except Exception as e:
+        return False, f"Lỗi: {str(e)[:100]}"
+
+def fetch_server_summary(sheet_name, version=None, sheet_url=None):
+    """Gọi get_summary của server (không qua cache).
+
+    Nếu có version của bản đã lưu, server hỗ trợ version sẽ trả về {"unchanged": true}
+    khi sheet chưa thay đổi; server cũ bỏ qua trường này và trả về báo cáo đầy đủ.
+    """
     data = {
         "action": "get_summary",
         "sheet_name": sheet_name
     }
+    if version:
+        data["version"] = version
     
     try:
-        with st.spinner('Đang tải báo cáo...'):
-            response = requests.post(
-                SHEET_URL_KEY, 
-                json=data, 
-                timeout=45,
-                headers={
-                    'Content-Type': 'application/json',
-                    'User-Agent': 'StreamlitApp/1.0'
-                }
-            )
+        response = request_with_policy(data, "summary", sheet_url)
+        
+        if response.status_code == 200:
+            try:
+                summary_data = read_response(response, sheet_url)
+                if summary_data.get('error'):
+                    return False, f"Lỗi: {summary_data.get('message', 'Unknown error')}"
+                return True, summary_data
+            except ValueError:
+                return False, "Phản hồi không hợp lệ từ server"
+        else:
+            return False, f"Lỗi {response.status_code}: Không thể tải báo cáo"
             
-            if response.status_code == 200:
-                try:
-                    summary_data = response.json()
-                    if summary_data.get('error'):
-                        return False, f"Lỗi: {summary_data.get('message', 'Unknown error')}"
-                    
-                    # Cache kết quả
-                    st.session_state.cached_summary = summary_data
-                    st.session_state.last_update = time.time()
-                    return True, summary_data
-                except json.JSONDecodeError:
-                    return False, "Phản hồi không hợp lệ từ server"
-            else:
-                return False, f"Lỗi {response.status_code}: Không thể tải báo cáo"
-                
+    except CircuitOpenError as e:
+        return False, circuit_open_message(e)
     except requests.exceptions.Timeout:
         return False, "Timeout: Không thể tải báo cáo"
     except Exception as e:
         return False, f"Lỗi: {str(e)[:100]}"
 
+RECONCILE_DELAY = float(os.getenv('RECONCILE_DELAY', '2'))
+
+@st.cache_resource
+def get_reconciler():
+    """Đối chiếu nền báo cáo đã cập nhật lạc quan với server"""
+    return SummaryReconciler(
+        get_summary_cache(),
+        # key = (URL deploy, sheet): luồng nền dùng chung nên phải hỏi đúng deployment của key
+        lambda key: fetch_server_summary(key[1], sheet_url=key[0]),
+        delay=RECONCILE_DELAY,
+        on_result=get_metrics().record_reconcile
+    )
+
+def fetch_summary(sheet_name, mode=None):
+    """Lấy dữ liệu báo cáo với cache (không hiển thị UI, dùng được từ luồng nền)"""
+    # Tháng đã qua đã có trong kho lưu trữ cục bộ: không tốn request nào
+    closed = ARCHIVE_ENABLED and is_closed_month(sheet_name)
+    if closed and get_archive(SHEET_URL_KEY).has(sheet_name):
+        success, result = fetch_archived_summary(sheet_name)
+        if success:
+            return True, result
+    
+    local = (mode or SUMMARY_MODE) == "local"
+    cache = get_summary_cache()
+    if not local:
+        # Kiểm tra cache theo sheet (mặc định 5 phút) trước khi tải giao dịch thô về kho
+        # (deployment không hỗ trợ get_transactions sẽ lỗi ở mỗi lần tải)
+        cached = cache.get(summary_cache_key(sheet_name))
+        get_metrics().record_cache("summary", cached is not None)
+        if cached is not None:
+            return True, cached
+    
+    if closed:
+        success, result = fetch_archived_summary(sheet_name)
+        if success:
+            return True, result
+    
+    if local:
+        return fetch_local_summary(sheet_name)
+    
+    # Gửi kèm version của bản đã hết hạn (trừ bản đã cộng tạm giao dịch chưa đối chiếu)
+    previous = cache.get_stale(summary_cache_key(sheet_name))
+    version = previous.get('version') if previous and not previous.get('unconfirmed') else None
+    success, result = fetch_server_summary(sheet_name, version)
+    if success and result.get('unchanged'):
+        get_metrics().record_cache("summary_version", result.get('version') == version)
+        if result.get('version') == version:
+            # Sheet chưa đổi: dùng lại bản cũ, không cần tải lại báo cáo
+            cache.set(summary_cache_key(sheet_name), previous)
+            return True, previous
+        success, result = fetch_server_summary(sheet_name)
+    elif success and version:
+        get_metrics().record_cache("summary_version", False)
+    if success:
+        # Cache kết quả
+        cache.set(summary_cache_key(sheet_name), result)
+        return True, result
+    message = result
+
+    # Server lỗi: dùng tạm bản cache đã hết hạn nếu có
+    stale = cache.get_stale(summary_cache_key(sheet_name))
+    if stale is not None:
+        return True, dict(stale, stale=True)
+    return False, message
+
+def get_summary_data(sheet_name, mode=None):
+    """Lấy dữ liệu báo cáo với cache"""
+    with st.spinner('Đang tải báo cáo...'):
+        return fetch_summary(sheet_name, mode)
+
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', '1') == '1'
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '1'))
+PREFETCH_FREQUENT = int(os.getenv('PREFETCH_FREQUENT', '2'))
+
+def prefetch_summary(target):
+    """Làm nóng báo cáo của (sheet, chế độ) nếu chưa có, trả về True nếu phải gửi request"""
+    sheet_name, mode = target
+    if ARCHIVE_ENABLED and is_closed_month(sheet_name) and get_archive(SHEET_URL_KEY).has(sheet_name):
+        return False
+    if (mode or SUMMARY_MODE) != "local" and get_summary_cache().contains(summary_cache_key(sheet_name)):
+        return False
+    # Chạy trong pool báo cáo để tải trước cũng tính vào giới hạn request song song
+    get_report_executor().submit(fetch_summary, sheet_name, mode).result()
+    return True
+
+@st.cache_resource
+def get_prefetcher(sheet_url):
+    """Luồng nền tải trước báo cáo các tháng lân cận và hay xem"""
+    return SummaryPrefetcher(
+        prefetch_summary,
+        interval=PREFETCH_INTERVAL,
+        # Không tải trước khi server đang lỗi liên tục
+        paused=lambda: get_retry_policy(sheet_url).breaker.retry_in() > 0
+    )
+
+def adjacent_sheets(sheet_name):
+    """Sheet của tháng trước và tháng sau (bỏ qua tháng trong tương lai)"""
+    month, year = (int(part) for part in sheet_name.split('/'))
+    first_day = date(year, month, 1)
+    previous = (first_day - timedelta(days=1)).strftime('%m/%Y')
+    following = (first_day + timedelta(days=32)).replace(day=1)
+    if following > date.today():
+        return [previous]
+    return [previous, following.strftime('%m/%Y')]
+
+def schedule_prefetch(sheet_name, mode):
+    """Ghi nhận lần mở báo cáo và hẹn tải trước các tháng người dùng có thể mở tiếp"""
+    prefetcher = get_prefetcher(SHEET_URL_KEY)
+    # Chỉ tính một lần cho mỗi lần chuyển tháng, không tính các lần rerun
+    if st.session_state.get("last_report_sheet") != sheet_name:
+        st.session_state.last_report_sheet = sheet_name
+        prefetcher.record_open(sheet_name)
+    neighbours = adjacent_sheets(sheet_name)
+    frequent = prefetcher.frequent(PREFETCH_FREQUENT, exclude=[sheet_name] + neighbours)
+    prefetcher.schedule([(name, mode) for name in neighbours + frequent])
+
+# Số request get_summary chạy song song tối đa (tránh vượt quota Apps Script)
+REPORT_MAX_WORKERS = int(os.getenv('REPORT_MAX_WORKERS', '4'))
+
+@st.cache_resource
+def get_report_executor():
+    """Pool dùng chung cho mọi session: tổng số request báo cáo song song của process
+    (báo cáo nhiều tháng, khoảng ngày, tải trước) không vượt REPORT_MAX_WORKERS"""
+    return ThreadPoolExecutor(max_workers=REPORT_MAX_WORKERS, thread_name_prefix="report")
+
+def month_sheets(start_date, end_date):
+    """Danh sách tên sheet MM/YYYY từ tháng của start_date đến tháng của end_date"""
+    sheets = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        sheets.append(f"{month:02d}/{year}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return sheets
+
+def fetch_range_summary(sheet_names, mode=None):
+    """Lấy song song báo cáo của nhiều tháng rồi gộp lại"""
+    results = list(get_report_executor().map(lambda name: fetch_summary(name, mode), sheet_names))
+
+    merged = {
+        "total_income": 0,
+        "total_expense": 0,
+        "expense_by_category": {},
+        "months": [],
+        "errors": {}
+    }
+    for sheet_name, (success, result) in zip(sheet_names, results):
+        if not success:
+            merged["errors"][sheet_name] = result
+            continue
+
+        income = result.get('total_income', 0)
+        expense = result.get('total_expense', 0)
+        merged["total_income"] += income
+        merged["total_expense"] += expense
+        for category, amount in (result.get('expense_by_category') or {}).items():
+            merged["expense_by_category"][category] = merged["expense_by_category"].get(category, 0) + amount
+        merged["months"].append({
+            "sheet_name": sheet_name,
+            "total_income": income,
+            "total_expense": expense
+        })
+    return merged
+
+def get_range_summary_data(sheet_names, mode=None):
+    """Lấy báo cáo gộp cho nhiều tháng"""
+    with st.spinner(f'Đang tải báo cáo {len(sheet_names)} tháng...'):
+        merged = fetch_range_summary(sheet_names, mode)
+    if not merged["months"]:
+        return False, "Không tải được báo cáo của tháng nào trong khoảng đã chọn"
+    return True, merged
+
+INDEX_COLUMNS = ["date", "type", "category", "amount"]
+
+@st.cache_resource
+def get_range_index(sheet_url):
+    """Chỉ mục tổng cộng dồn theo ngày, mỗi URL deploy một chỉ mục riêng"""
+    from prefix_index import PrefixSumIndex
+    # Cùng thời hạn với cache báo cáo tháng: tự nạp lại giao dịch ghi từ nơi khác
+    return PrefixSumIndex(origin=MIN_DATE, ttl=SUMMARY_CACHE_TTL)
+
+def load_sheet_frame(sheet_name):
+    """Giao dịch thô của một sheet: tháng đã qua đọc từ kho lưu trữ, tháng hiện tại qua bộ tính tại máy"""
+    if ARCHIVE_ENABLED and is_closed_month(sheet_name):
+        archive = get_archive(SHEET_URL_KEY)
+        if not archive.has(sheet_name):
+            rows, _ = fetch_transactions(sheet_name, 0)
+            archive.write(sheet_name, rows)
+        return archive.read([sheet_name], columns=INDEX_COLUMNS)
+    engine = get_local_engine(SHEET_URL_KEY)
+    engine.sync(sheet_name)
+    return engine.frame(sheet_name)
+
+def apply_written_transactions(sheet_name, transactions, sheet_url=None):
+    """Cập nhật báo cáo đã cache và chỉ mục theo giao dịch vừa ghi thành công.
+
+    Báo cáo đã cache được cộng thêm ngay (không cần chờ get_summary) rồi đối chiếu nền
+    với server; nếu sheet chưa có trong cache thì lần xem sau sẽ tải từ server.
+    """
+    if not transactions:
+        return
+    sheet_url = sheet_url or SHEET_URL_KEY
+    get_archive(sheet_url).invalidate(sheet_name)
+    get_ledger_pager(sheet_url).invalidate(sheet_name)
+    get_reconciler().apply(summary_cache_key(sheet_name, sheet_url), transactions)
+    get_range_index(sheet_url).add(sheet_name, transactions)
+
+def apply_written_safely(sheet_name, transactions, sheet_url=None):
+    """apply_written_transactions nhưng không bao giờ raise.
+
+    Server đã ghi xong: lỗi cập nhật tại máy không được biến lần ghi thành thất bại
+    (nhật ký sẽ gửi lại mãi), chỉ bỏ bản đã lưu để lần xem sau tải lại từ server.
+    """
+    sheet_url = sheet_url or SHEET_URL_KEY
+    try:
+        apply_written_transactions(sheet_name, transactions, sheet_url)
+    except Exception:
+        get_summary_cache().invalidate(summary_cache_key(sheet_name, sheet_url))
+        get_range_index(sheet_url).drop(sheet_name)
+        get_ledger_pager(sheet_url).invalidate(sheet_name)
+
+def fetch_day_range_summary(start_date, end_date):
+    """Báo cáo cho khoảng ngày bất kỳ từ chỉ mục cộng dồn, nạp các sheet còn thiếu trước"""
+    index = get_range_index(SHEET_URL_KEY)
+    # Giao dịch được tìm theo sheet của các tháng trong khoảng ngày
+    missing = [name for name in month_sheets(start_date, end_date) if not index.has(name)]
+    errors = {}
+
+    def load(sheet_name):
+        try:
+            index.load(sheet_name, load_sheet_frame(sheet_name))
+        except Exception as e:
+            errors[sheet_name] = f"Lỗi: {str(e)[:100]}"
+
+    if missing:
+        list(get_report_executor().map(load, missing))
+
+    result = index.summary(start_date, end_date)
+    result["daily"] = index.daily(start_date, end_date)
+    result["errors"] = errors
+    return result
+
 def format_currency(amount):
     """Format số tiền theo định dạng VN"""
     try:
         return f"{int(amount):,}".replace(',', '.') + " VNĐ"
-    except:
+    except (TypeError, ValueError, OverflowError):
         return "0 VNĐ"
 
+def format_currency_series(amounts):
+    """Phiên bản vector hóa của format_currency cho Series số tiền"""
+    import pandas as pd
+    values = pd.to_numeric(amounts, errors="coerce").fillna(0).astype("int64")
+    # Ép kiểu và xử lý giá trị lỗi cho cả cột, đổi dấu phân cách hàng nghìn trong một lần
+    return values.map("{:,}".format).str.replace(",", ".", regex=False) + " VNĐ"
+
+@st.cache_resource
+def get_render_cache():
+    """Bảng và dữ liệu biểu đồ đã dựng, theo mã băm nội dung báo cáo"""
+    return SummaryCache(ttl=float("inf"), max_size=64)
+
+def summary_content_hash(expense_by_category, total_expense):
+    """Mã băm phần nội dung báo cáo dùng để dựng bảng/biểu đồ danh mục"""
+    content = json.dumps([total_expense, expense_by_category], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def build_expense_table(expense_by_category, total_expense):
+    """Dựng bảng chi tiêu theo danh mục (đã sắp xếp, định dạng) và dữ liệu biểu đồ.
+    
+    Kết quả được nhớ theo mã băm nội dung, nên các lần rerun với báo cáo không đổi
+    không phải dựng lại DataFrame.
+    """
+    import pandas as pd
+    cache = get_render_cache()
+    key = summary_content_hash(expense_by_category, total_expense)
+    built = cache.get(key)
+    get_metrics().record_cache("render", built is not None)
+    if built is not None:
+        return built
+    
+    df = pd.DataFrame({
+        'Danh Mục': list(expense_by_category.keys()),
+        'Số Tiền': list(expense_by_category.values())
+    })
+    # Sắp xếp theo số tiền giảm dần
+    df = df.sort_values('Số Tiền', ascending=False, ignore_index=True)
+    df['Tỷ lệ %'] = (df['Số Tiền'] / total_expense * 100).round(1)
+    df['Số Tiền (VNĐ)'] = format_currency_series(df['Số Tiền'])
+    
+    built = (df[['Danh Mục', 'Số Tiền (VNĐ)', 'Tỷ lệ %']], df.set_index('Danh Mục')['Số Tiền'])
+    cache.set(key, built)
+    return built
+
+SYNC_STATUS_REFRESH = float(os.getenv('SYNC_STATUS_REFRESH', '2'))
+SYNC_STATUS_ICONS = {"pending": "⏳", "synced": "✅", "failed": "❌"}
+
+@st.fragment(run_every=SYNC_STATUS_REFRESH)
+def render_sync_status():
+    """Khu vực trạng thái ghi, tự cập nhật mà không chạy lại toàn bộ trang"""
+    journal = get_journal()
+    statuses = journal.statuses(st.session_state.submitted_ids[-20:])
+    session_counts = {"pending": 0, "synced": 0, "failed": 0}
+    for entry in statuses.values():
+        session_counts[entry["status"]] += 1
+    
+    if statuses:
+        st.caption(
+            f"📝 Phiên này: ⏳ {session_counts['pending']} đang chờ · "
+            f"✅ {session_counts['synced']} thành công · "
+            f"❌ {session_counts['failed']} thất bại"
+        )
+        # Hiển thị các giao dịch gần nhất trước
+        for entry_id in reversed(st.session_state.submitted_ids[-5:]):
+            entry = statuses.get(entry_id)
+            if entry is None:
+                continue
+            transaction = entry["transaction"]
+            line = (
+                f"{SYNC_STATUS_ICONS[entry['status']]} {transaction['date']} · "
+                f"{transaction['category']} · {format_currency(transaction['amount'])}"
+            )
+            if entry["status"] == "failed" and entry["last_error"]:
+                line += f" — {entry['last_error'][:80]}"
+            st.caption(line)
+    
+    journal_counts = journal.counts()
+    if journal_counts['pending']:
+        st.caption(f"⏳ {journal_counts['pending']} giao dịch chờ đồng bộ")
+    if journal_counts['failed']:
+        st.warning(f"⚠️ {journal_counts['failed']} giao dịch đồng bộ thất bại")
+        if st.button("🔁 Đồng bộ lại"):
+            journal.retry_failed()
+            get_sync_worker().notify()
+
+def render_diagnostics():
+    """Bảng chẩn đoán: thời gian request, retry, mã HTTP, cache và các pha rerun"""
+    import pandas as pd
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+    snapshot["connection_pool"] = get_pool_stats()
+    snapshot["resilience"] = get_resilience_stats()
+    
+    if snapshot["requests"]:
+        st.caption("⏱️ Request")
+        st.dataframe(
+            pd.DataFrame(snapshot["requests"]).T,
+            use_container_width=True
+        )
+    if snapshot["phases"]:
+        st.caption("🧩 Các pha của lần chạy script")
+        st.dataframe(
+            pd.DataFrame(snapshot["phases"]).T[["count", "avg_ms", "p95_ms", "max_ms"]],
+            use_container_width=True
+        )
+    for name, stats in snapshot["cache"].items():
+        st.caption(f"🗃️ Cache {name}: {stats['hits']} hit / {stats['misses']} miss ({stats['hit_ratio']:.0%})")
+    if snapshot["http_statuses"]:
+        st.caption("📶 HTTP: " + ", ".join(f"{k}: {v}" for k, v in snapshot["http_statuses"].items()))
+    if snapshot["retries"]:
+        st.caption("🔁 Retry: " + ", ".join(
+            f"{action}: {count} lần ({snapshot['backoff_seconds'][action]}s chờ)"
+            for action, count in snapshot["retries"].items()
+        ))
+    if snapshot["reconcile"]:
+        st.caption("🔄 Đối chiếu báo cáo: " + ", ".join(f"{k}: {v}" for k, v in snapshot["reconcile"].items()))
+    mismatches = list(get_reconciler().mismatches)
+    if mismatches:
+        with st.expander(f"⚠️ {len(mismatches)} lần báo cáo tại máy lệch với server"):
+            for mismatch in reversed(mismatches):
+                at = datetime.fromtimestamp(mismatch["at"]).strftime('%H:%M:%S')
+                fields = ", ".join(
+                    f"{name}: {local:,.0f} ≠ {server:,.0f}" for name, (local, server) in mismatch["diff"].items()
+                )
+                st.caption(f"{at} · {mismatch['key'][1]} · {fields}")
+    if PREFETCH_ENABLED:
+        prefetch_stats = get_prefetcher(SHEET_URL_KEY).stats
+        if prefetch_stats:
+            st.caption("🔮 Tải trước: " + ", ".join(f"{k}: {v}" for k, v in prefetch_stats.items()))
+    resilience = snapshot["resilience"]
+    st.caption(
+        f"🛡️ Circuit breaker: {resilience['breaker_state']} · "
+        f"ngân sách retry còn {resilience['retry_budget_tokens']:.1f}"
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ JSON",
+            json.dumps(snapshot, ensure_ascii=False, indent=2),
+            file_name="metrics.json",
+            mime="application/json"
+        )
+    with col2:
+        st.download_button(
+            "⬇️ Prometheus",
+            metrics.to_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+    if st.button("🧹 Xóa số liệu"):
+        metrics.reset()
+        st.rerun()
+
+IMPORT_STATUS_LABELS = {
+    "synced": "✅ Đã đồng bộ",
+    "pending": "⏳ Chờ đồng bộ",
+    "failed": "❌ Thất bại",
+    "invalid": "⚠️ Không hợp lệ"
+}
+
+def render_import_tab():
+    """Nhập hàng loạt giao dịch từ file CSV sao kê ngân hàng"""
+    import pandas as pd
+    st.header("📥 Nhập Giao Dịch Từ File")
+    
+    uploaded = st.file_uploader(
+        "📄 File CSV:",
+        type=["csv"],
+        help="File sao kê ngân hàng hoặc dữ liệu cũ, mỗi dòng một giao dịch"
+    )
+    if uploaded is None:
+        st.caption("Nhập lại cùng một file sẽ bỏ qua các dòng đã đồng bộ và tiếp tục các dòng còn dở.")
+        return
+    
+    # Chỉ đọc vài dòng đầu để chọn cột
+    try:
+        preview = pd.read_csv(uploaded, nrows=5, dtype=str, keep_default_na=False)
+    except Exception as e:
+        st.error(f"❌ Không thể đọc file: {str(e)[:200]}")
+        return
+    st.dataframe(preview, use_container_width=True, hide_index=True)
+    
+    columns = list(preview.columns)
+    none_option = "— Không có —"
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        date_col = st.selectbox("📅 Cột ngày:", columns)
+        amount_col = st.selectbox("💰 Cột số tiền:", columns, index=min(1, len(columns) - 1))
+        dayfirst = st.checkbox("Ngày dạng dd/mm/yyyy", value=True)
+    
+    with col2:
+        type_col = st.selectbox(
+            "🔀 Cột loại (Thu/Chi):",
+            [none_option] + columns,
+            help="Nếu không có, số tiền âm được tính là Chi"
+        )
+        category_col = st.selectbox("📂 Cột danh mục:", [none_option] + columns)
+        note_col = st.selectbox(
+            "📝 Cột mô tả/ghi chú:",
+            [none_option] + columns,
+            help="Dùng làm ghi chú và để tự nhận diện danh mục"
+        )
+    
+    if st.button("🚀 Bắt đầu nhập", type="primary"):
+        mapping = {
+            "date": date_col,
+            "amount": amount_col,
+            "type": None if type_col == none_option else type_col,
+            "category": None if category_col == none_option else category_col,
+            "note": None if note_col == none_option else note_col
+        }
+        
+        progress_bar = st.progress(0.0, text="Đang nhập...")
+        def update_progress(done, total):
+            progress_bar.progress(min(done / total, 1.0), text=f"Đã xử lý {done}/{total} dòng")
+        
+        try:
+            results = import_transactions(uploaded, mapping, dayfirst=dayfirst, progress=update_progress)
+        except Exception as e:
+            st.error(f"❌ Lỗi khi nhập file: {str(e)[:200]}")
+            return
+        
+        counts = results["status"].value_counts()
+        cols = st.columns(len(IMPORT_STATUS_LABELS))
+        for col, (status, label) in zip(cols, IMPORT_STATUS_LABELS.items()):
+            with col:
+                st.metric(label, int(counts.get(status, 0)))
+        
+        display = results.assign(status=results["status"].map(IMPORT_STATUS_LABELS))
+        display.columns = ["Dòng", "Sheet", "Trạng thái", "Thông báo"]
+        st.dataframe(display, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Tải kết quả",
+            display.to_csv(index=False).encode("utf-8-sig"),
+            file_name="ket_qua_nhap.csv",
+            mime="text/csv"
+        )
+
+def render_summary(summary_data):
+    """Hiển thị metrics, bảng và biểu đồ chi tiêu theo danh mục của một báo cáo"""
+    # Metrics chính
+    col1, col2, col3 = st.columns(3)
+    
+    total_income = summary_data.get('total_income', 0)
+    total_expense = summary_data.get('total_expense', 0)
+    balance = total_income - total_expense
+    
+    with col1:
+        st.metric(
+            "💵 Tổng Thu", 
+            format_currency(total_income)
+        )
+    
+    with col2:
+        st.metric(
+            "💸 Tổng Chi", 
+            format_currency(total_expense)
+        )
+    
+    with col3:
+        st.metric(
+            "💰 Số Dư", 
+            format_currency(balance),
+            delta=f"{balance:,.0f} VNĐ".replace(',', '.'),
+            delta_color="normal" if balance >= 0 else "inverse"
+        )
+    
+    # Biểu đồ và bảng chi tiết
+    if total_expense > 0 and 'expense_by_category' in summary_data:
+        st.subheader("📈 Chi Tiết Chi Tiêu Theo Danh Mục")
+        
+        expense_data = summary_data['expense_by_category']
+        if expense_data:
+            with get_metrics().phase("dataframe"):
+                table, chart_data = build_expense_table(expense_data, total_expense)
+            
+            with get_metrics().phase("chart"):
+                # Hiển thị bảng
+                st.dataframe(
+                    table, 
+                    use_container_width=True,
+                    hide_index=True
+                )
+                
+                # Biểu đồ tròn
+                st.subheader("🥧 Biểu Đồ Phân Bổ Chi Tiêu")
+                st.bar_chart(chart_data)
+
+def render_month_report(selected_month, selected_year, sheet_name, summary_mode):
+    """Báo cáo của một tháng"""
+    st.header(f"📊 Báo Cáo Tháng {selected_month:02d}/{selected_year}")
+    
+    # Auto load báo cáo
+    with get_metrics().phase("fetch"):
+        success, result = get_summary_data(sheet_name, mode=summary_mode)
+    
+    if success:
+        summary_data = result
+        if summary_data.get('stale'):
+            st.warning("⚠️ Không tải được dữ liệu mới từ server, đang hiển thị bản đã lưu trước đó")
+        elif summary_data.get('unconfirmed'):
+            st.caption("⏳ Đã cộng giao dịch vừa ghi, đang đối chiếu với server")
+        mismatch = get_reconciler().last_mismatch(summary_cache_key(sheet_name))
+        cached_at = get_summary_cache().timestamp(summary_cache_key(sheet_name))
+        if mismatch and cached_at and mismatch["at"] >= cached_at:
+            st.warning("⚠️ Số liệu cập nhật tại máy lệch với server, đã chuyển sang số liệu của server")
+        
+        render_summary(summary_data)
+        
+        # Thông tin bổ sung
+        if cached_at:
+            update_time = datetime.fromtimestamp(cached_at)
+            st.caption(f"📅 Cập nhật lần cuối: {update_time.strftime('%H:%M:%S %d/%m/%Y')}")
+    
+        
+        # Tải trước tháng trước/sau và các tháng hay xem để chuyển tháng không phải chờ
+        if PREFETCH_ENABLED:
+            schedule_prefetch(sheet_name, summary_mode)
+    
+    else:
+        st.error(f"❌ {result}")
+        if st.button("🔄 Thử lại"):
+            st.rerun()
+
+def render_day_range_report(selected_date):
+    """Báo cáo cho khoảng ngày bất kỳ, tính từ chỉ mục cộng dồn theo ngày"""
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input(
+            "Từ ngày:",
+            value=max(selected_date - timedelta(days=29), MIN_DATE),
+            min_value=MIN_DATE,
+            max_value=date.today()
+        )
+    with col2:
+        end_date = st.date_input(
+            "Đến ngày:",
+            value=min(selected_date, date.today()),
+            min_value=MIN_DATE,
+            max_value=date.today()
+        )
+    if start_date > end_date:
+        st.error("❌ Ngày bắt đầu phải trước ngày kết thúc")
+        return
+    
+    st.header(f"📊 Báo Cáo {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}")
+    with get_metrics().phase("fetch"):
+        with st.spinner("Đang tải giao dịch..."):
+            result = fetch_day_range_summary(start_date, end_date)
+    
+    render_summary(result)
+    
+    st.subheader("📉 Thu Chi Theo Ngày")
+    st.bar_chart(result["daily"])
+    
+    if result["errors"]:
+        with st.expander(f"⚠️ {len(result['errors'])} tháng không tải được"):
+            for sheet_name, message in result["errors"].items():
+                st.caption(f"{sheet_name}: {message}")
+
+def render_range_report(selected_date, summary_mode):
+    """Báo cáo gộp theo quý, năm hoặc khoảng tháng tùy chọn"""
+    import pandas as pd
+    range_type = st.selectbox("Khoảng thời gian:", ["Quý", "Năm", "Tùy chọn", "Khoảng ngày"])
+    
+    if range_type == "Khoảng ngày":
+        render_day_range_report(selected_date)
+        return
+    
+    if range_type == "Quý":
+        first_month = (selected_date.month - 1) // 3 * 3 + 1
+        start_date = date(selected_date.year, first_month, 1)
+        end_date = date(selected_date.year, first_month + 2, 1)
+        title = f"Quý {(first_month - 1) // 3 + 1}/{selected_date.year}"
+    elif range_type == "Năm":
+        start_date = date(selected_date.year, 1, 1)
+        end_date = date(selected_date.year, 12, 1)
+        title = f"Năm {selected_date.year}"
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input(
+                "Từ tháng:",
+                value=date(selected_date.year, 1, 1),
+                min_value=date(2020, 1, 1),
+                max_value=date.today()
+            )
+        with col2:
+            end_date = st.date_input(
+                "Đến tháng:",
+                value=selected_date,
+                min_value=date(2020, 1, 1),
+                max_value=date.today()
+            )
+        if start_date > end_date:
+            st.error("❌ Tháng bắt đầu phải trước tháng kết thúc")
+            return
+        title = f"{start_date.month:02d}/{start_date.year} - {end_date.month:02d}/{end_date.year}"
+    
+    # Không lấy báo cáo cho các tháng trong tương lai
+    today = date.today()
+    end_date = min(end_date, today)
+    sheet_names = month_sheets(start_date, end_date)
+    
+    st.header(f"📊 Báo Cáo {title}")
+    with get_metrics().phase("fetch"):
+        success, result = get_range_summary_data(sheet_names, mode=summary_mode)
+    if not success:
+        st.error(f"❌ {result}")
+        return
+    
+    render_summary(result)
+    
+    # Xu hướng theo tháng
+    st.subheader("📉 Xu Hướng Theo Tháng")
+    trend = pd.DataFrame(result["months"]).set_index("sheet_name")
+    trend.index.name = "Tháng"
+    trend.columns = ["Thu", "Chi"]
+    st.line_chart(trend)
+    
+    if result["errors"]:
+        with st.expander(f"⚠️ {len(result['errors'])} tháng không tải được"):
+            for sheet_name, message in result["errors"].items():
+                st.caption(f"{sheet_name}: {message}")
+
+def render_ledger_tab(sheet_name, selected_month, selected_year):
+    """Sổ giao dịch của sheet, tải từng trang từ server và tải trước trang kế tiếp"""
+    import pandas as pd
+    st.header(f"📒 Sổ Giao Dịch Tháng {selected_month:02d}/{selected_year}")
+    
+    first_day = date(selected_year, selected_month, 1)
+    last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        type_filter = st.selectbox("🔀 Loại:", ["Tất cả", "Thu", "Chi"])
+        page_size = st.selectbox("📄 Số dòng mỗi trang:", LEDGER_PAGE_SIZES)
+    with col2:
+        if type_filter == "Thu":
+            categories = INCOME_CATEGORIES
+        elif type_filter == "Chi":
+            categories = EXPENSE_CATEGORIES
+        else:
+            categories = list(dict.fromkeys(INCOME_CATEGORIES + EXPENSE_CATEGORIES))
+        category_filter = st.selectbox("📂 Danh mục:", ["Tất cả"] + categories)
+    with col3:
+        date_from = st.date_input("📅 Từ ngày:", value=first_day, min_value=first_day, max_value=last_day)
+        date_to = st.date_input("📅 Đến ngày:", value=last_day, min_value=first_day, max_value=last_day)
+    
+    filters = {}
+    if type_filter != "Tất cả":
+        filters["type"] = type_filter
+    if category_filter != "Tất cả":
+        filters["category"] = category_filter
+    # Cả tháng thì không lọc theo ngày (giữ cả giao dịch ghi vào sheet với ngày khác tháng)
+    if date_from != first_day:
+        filters["date_from"] = date_from.strftime("%Y-%m-%d")
+    if date_to != last_day:
+        filters["date_to"] = date_to.strftime("%Y-%m-%d")
+    
+    # Cursor đầu mỗi trang đã xem, đổi sheet hoặc bộ lọc thì về trang đầu
+    query = (sheet_name, page_size, tuple(sorted(filters.items())))
+    if st.session_state.get("ledger_query") != query:
+        st.session_state.ledger_query = query
+        st.session_state.ledger_cursors = [0]
+    cursors = st.session_state.ledger_cursors
+    
+    pager = get_ledger_pager(SHEET_URL_KEY)
+    try:
+        with get_metrics().phase("fetch"):
+            with st.spinner("Đang tải giao dịch..."):
+                rows, next_cursor, has_more = pager.page(sheet_name, cursors[-1], page_size, filters)
+    except Exception as e:
+        st.error(f"❌ Không thể tải giao dịch: {str(e)[:200]}")
+        return
+    
+    # Tải trước trang sau trong lúc người dùng xem trang này
+    if has_more:
+        pager.prefetch(sheet_name, next_cursor, page_size, filters)
+    
+    if rows:
+        with get_metrics().phase("dataframe"):
+            df = pd.DataFrame(rows).reindex(columns=["date", "type", "category", "amount", "note"])
+            df["amount"] = format_currency_series(df["amount"])
+            df.columns = ["Ngày", "Loại", "Danh Mục", "Số Tiền", "Ghi Chú"]
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.info("📭 Không có giao dịch nào khớp bộ lọc")
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button(
+            "◀ Trang trước",
+            disabled=len(cursors) == 1,
+            on_click=lambda: cursors.pop()
+        )
+    with col2:
+        st.caption(f"Trang {len(cursors)} · {len(rows)} giao dịch")
+    with col3:
+        st.button(
+            "Trang sau ▶",
+            disabled=not has_more,
+            on_click=lambda: cursors.append(next_cursor)
+        )
+
+VIEWS = ["💵 Thu Nhập", "💸 Chi Tiêu", "📊 Báo Cáo", "📒 Sổ Giao Dịch", "📥 Nhập File"]
+
+def configure_page():
+    """Cấu hình trang: phải là lệnh Streamlit đầu tiên của mỗi lần chạy, trước mọi hàm
+    @st.cache_resource (spinner của cache khi tính lần đầu cũng là một element)"""
+    st.set_page_config(
+        page_title="Quản lý Thu Chi Cá Nhân",
+        page_icon="💰",
+        layout="wide"
+    )
+
 def main():
+    global SHEET_URL_KEY
+    
+    with get_metrics().phase("config"):
+        SHEET_URL_KEY = get_sheet_url()
+    
+    if not SHEET_URL_KEY:
+        render_setup_help()
+        st.stop()
+    
     st.title("💰 Quản Lý Thu Chi Cá Nhân")
     
+    # Các giao dịch đã gửi trong phiên, dùng cho khu vực trạng thái ghi
+    if 'submitted_ids' not in st.session_state:
+        st.session_state.submitted_ids = []
+    
     # Test connection button in sidebar
     with st.sidebar:
         st.header("🔧 Kiểm tra kết nối")
         if st.button("🔍 Test kết nối", type="secondary"):
+            # Script có thể vừa được deploy lại: hỏi lại định dạng truyền ở request sau
+            get_wire_codec(SHEET_URL_KEY).reset()
             success, message = test_connection()
             if success:
                 st.success(message)
             else:
                 st.error(message)
         
+        # Thống kê tái sử dụng kết nối HTTP
+        pool_stats = get_pool_stats()
+        st.caption(
+            f"🔌 Kết nối: {pool_stats['connections']} mở / "
+            f"{pool_stats['requests']} request "
+            f"(tái sử dụng {pool_stats['reuse_ratio']:.0%})"
+        )
+        resilience = get_resilience_stats()
+        if resilience["breaker_state"] != CircuitBreaker.CLOSED:
+            st.warning(f"⛔ Server lỗi liên tục, tạm ngưng gửi request (thử lại sau {resilience['breaker_retry_in_s']:.0f}s)")
+        
+        # Trạng thái đồng bộ nhật ký giao dịch
+        get_sync_worker()
+        render_sync_status()
+        
         st.markdown("---")
         st.header("📅 Chọn thời gian")
         
@@ -274,17 +1549,34 @@ def main():
         sheet_name = f"{selected_month:02d}/{selected_year}"
         st.info(f"📊 Sheet hiện tại: **{sheet_name}**")
         
+        summary_mode = "local" if st.toggle(
+            "🧮 Tính báo cáo tại máy",
+            value=SUMMARY_MODE == "local",
+            help="Chỉ tải giao dịch mới và tự tính báo cáo thay vì để Apps Script tính"
+        ) else "server"
+        
         # Thêm nút clear cache
         if st.button("🔄 Làm mới dữ liệu"):
-            st.session_state.cached_summary = None
-            st.session_state.last_update = None
+            # Giữ bản cũ để hỏi server bằng version, chỉ tải lại nếu sheet đã đổi
+            get_summary_cache().expire(summary_cache_key(sheet_name))
+            get_local_engine(SHEET_URL_KEY).reset(sheet_name)
+            get_archive(SHEET_URL_KEY).invalidate(sheet_name)
+            get_range_index(SHEET_URL_KEY).drop(sheet_name)
+            get_ledger_pager(SHEET_URL_KEY).invalidate(sheet_name)
             st.rerun()
 
-    # Tabs chính
-    tab1, tab2, tab3 = st.tabs(["💵 Thu Nhập", "💸 Chi Tiêu", "📊 Báo Cáo"])
+    # Chỉ chạy phần của chức năng đang mở (st.tabs chạy tất cả các tab mỗi lần rerun,
+    # kể cả tải báo cáo khi người dùng chỉ nhập giao dịch)
+    active_view = st.radio(
+        "Chức năng:",
+        VIEWS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="active_view"
+    )
     
     # Tab Thu Nhập
-    with tab1:
+    if active_view == VIEWS[0]:
         st.header("💵 Ghi Nhận Thu Nhập")
         
         with st.form("income_form", clear_on_submit=True):
@@ -330,28 +1622,23 @@ def main():
                 elif not date_valid:
                     st.error(f"❌ {date_msg}")
                 else:
-                    data = {
-                        "action": "add_transaction",
-                        "sheet_name": sheet_name,
-                        "transaction": {
-                            "date": income_date.strftime("%Y-%m-%d"),
-                            "type": "Thu",
-                            "category": income_category,
-                            "amount": income_amount,
-                            "note": income_note.strip()
-                        }
+                    transaction = {
+                        "date": income_date.strftime("%Y-%m-%d"),
+                        "type": "Thu",
+                        "category": income_category,
+                        "amount": income_amount,
+                        "note": income_note.strip()
                     }
                     
-                    success, message = send_to_sheet(data)
+                    success, message, entry_id = submit_transaction(sheet_name, transaction)
                     if success:
+                        st.session_state.submitted_ids.append(entry_id)
                         st.success(message)
-                        time.sleep(1)
-                        st.rerun()
                     else:
                         st.error(message)
 
     # Tab Chi Tiêu
-    with tab2:
+    if active_view == VIEWS[1]:
         st.header("💸 Ghi Nhận Chi Tiêu")
         
         with st.form("expense_form", clear_on_submit=True):
@@ -397,101 +1684,41 @@ def main():
                 elif not date_valid:
                     st.error(f"❌ {date_msg}")
                 else:
-                    data = {
-                        "action": "add_transaction",
-                        "sheet_name": sheet_name,
-                        "transaction": {
-                            "date": expense_date.strftime("%Y-%m-%d"),
-                            "type": "Chi",
-                            "category": expense_category,
-                            "amount": expense_amount,
-                            "note": expense_note.strip()
-                        }
+                    transaction = {
+                        "date": expense_date.strftime("%Y-%m-%d"),
+                        "type": "Chi",
+                        "category": expense_category,
+                        "amount": expense_amount,
+                        "note": expense_note.strip()
                     }
                     
-                    success, message = send_to_sheet(data)
+                    success, message, entry_id = submit_transaction(sheet_name, transaction)
                     if success:
+                        st.session_state.submitted_ids.append(entry_id)
                         st.success(message)
-                        time.sleep(1)
-                        st.rerun()
                     else:
                         st.error(message)
 
     # Tab Báo Cáo
-    with tab3:
-        st.header(f"📊 Báo Cáo Tháng {selected_month:02d}/{selected_year}")
-        
-        # Auto load báo cáo
-        success, result = get_summary_data(sheet_name)
-        
-        if success:
-            summary_data = result
-            
-            # Metrics chính
-            col1, col2, col3 = st.columns(3)
-            
-            total_income = summary_data.get('total_income', 0)
-            total_expense = summary_data.get('total_expense', 0)
-            balance = total_income - total_expense
-            
-            with col1:
-                st.metric(
-                    "💵 Tổng Thu", 
-                    format_currency(total_income)
-                )
-            
-            with col2:
-                st.metric(
-                    "💸 Tổng Chi", 
-                    format_currency(total_expense)
-                )
-            
-            with col3:
-                st.metric(
-                    "💰 Số Dư", 
-                    format_currency(balance),
-                    delta=f"{balance:,.0f} VNĐ".replace(',', '.'),
-                    delta_color="normal" if balance >= 0 else "inverse"
-                )
-            
-            # Biểu đồ và bảng chi tiết
-            if total_expense > 0 and 'expense_by_category' in summary_data:
-                st.subheader("📈 Chi Tiết Chi Tiêu Theo Danh Mục")
-                
-                expense_data = summary_data['expense_by_category']
-                if expense_data:
-                    # Tạo DataFrame
-                    df = pd.DataFrame(
-                        list(expense_data.items()),
-                        columns=['Danh Mục', 'Số Tiền']
-                    )
-                    df['Tỷ lệ %'] = (df['Số Tiền'] / total_expense * 100).round(1)
-                    df['Số Tiền (VNĐ)'] = df['Số Tiền'].apply(format_currency)
-                    
-                    # Sắp xếp theo số tiền giảm dần
-                    df = df.sort_values('Số Tiền', ascending=False)
-                    
-                    # Hiển thị bảng
-                    st.dataframe(
-                        df[['Danh Mục', 'Số Tiền (VNĐ)', 'Tỷ lệ %']], 
-                        use_container_width=True,
-                        hide_index=True
-                    )
-                    
-                    # Biểu đồ tròn
-                    st.subheader("🥧 Biểu Đồ Phân Bổ Chi Tiêu")
-                    chart_data = df.set_index('Danh Mục')['Số Tiền']
-                    st.bar_chart(chart_data)
-            
-            # Thông tin bổ sung
-            if st.session_state.last_update:
-                update_time = datetime.fromtimestamp(st.session_state.last_update)
-                st.caption(f"📅 Cập nhật lần cuối: {update_time.strftime('%H:%M:%S %d/%m/%Y')}")
+    if active_view == VIEWS[2]:
+        report_type = st.radio(
+            "Loại báo cáo:",
+            ["Theo tháng", "Theo khoảng thời gian"],
+            horizontal=True
+        )
         
+        if report_type == "Theo khoảng thời gian":
+            render_range_report(selected_date, summary_mode)
         else:
-            st.error(f"❌ {result}")
-            if st.button("🔄 Thử lại"):
-                st.rerun()
+            render_month_report(selected_month, selected_year, sheet_name, summary_mode)
+
+    # Tab Sổ Giao Dịch
+    if active_view == VIEWS[3]:
+        render_ledger_tab(sheet_name, selected_month, selected_year)
+
+    # Tab Nhập File
+    if active_view == VIEWS[4]:
+        render_import_tab()
 
     # Footer
     st.markdown("---")
@@ -525,6 +1752,14 @@ def main():
         - **Lỗi 403:** Kiểm tra quyền truy cập
         - **Timeout:** Thử lại hoặc kiểm tra kết nối mạng
         """)
+    
+    # Bảng chẩn đoán hiệu năng (tùy chọn)
+    with st.sidebar:
+        st.markdown("---")
+        if st.toggle("🩺 Chẩn đoán hiệu năng"):
+            render_diagnostics()
 
 if __name__ == "__main__":
-    main()
+    configure_page()
+    with get_metrics().phase("rerun"):
+        main()
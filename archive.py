@@ -0,0 +1,89 @@
+import os
+import threading
+
+ARCHIVE_COLUMNS = ["date", "type", "category", "amount", "note", "id"]
+
+
+def partition_name(sheet_name):
+    """Tên file của phân vùng theo sheet MM/YYYY (ví dụ 01/2025 -> 2025-01.arrow)"""
+    month, year = sheet_name.split("/")
+    return f"{int(year):04d}-{int(month):02d}.arrow"
+
+
+class TransactionArchive:
+    """Kho lưu trữ cột (Arrow IPC) các giao dịch đã đồng bộ, mỗi sheet MM/YYYY một phân vùng.
+
+    File được đọc qua memory-map và chỉ lấy các cột cần thiết, nên truy vấn nhiều năm
+    chỉ chạm đến các phân vùng và cột được yêu cầu. pandas/pyarrow chỉ được import khi
+    đọc hoặc ghi, nên kiểm tra/xóa phân vùng không tốn thời gian import.
+    """
+
+    def __init__(self, root="archive"):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sheet_name):
+        return os.path.join(self.root, partition_name(sheet_name))
+
+    def has(self, sheet_name):
+        return os.path.exists(self.path(sheet_name))
+
+    def sheets(self):
+        """Danh sách sheet đã lưu trữ, theo thứ tự thời gian"""
+        names = []
+        for filename in sorted(os.listdir(self.root)):
+            if filename.endswith(".arrow"):
+                year, month = filename[:-len(".arrow")].split("-")
+                names.append(f"{month}/{year}")
+        return names
+
+    def write(self, sheet_name, rows):
+        """Ghi (thay thế) phân vùng của sheet từ danh sách giao dịch hoặc DataFrame"""
+        import pandas as pd
+        import pyarrow as pa
+
+        df = pd.DataFrame(rows).reindex(columns=ARCHIVE_COLUMNS)
+        for column in ["date", "type", "category", "note", "id"]:
+            df[column] = df[column].fillna("").astype(str)
+        df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        path = self.path(sheet_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # Thay file nguyên tử để người đọc không thấy phân vùng ghi dở
+        with self._lock:
+            os.replace(tmp_path, path)
+
+    def read(self, sheet_names, columns=None):
+        """Đọc các phân vùng qua memory-map, chỉ lấy các cột cần thiết, kèm cột sheet_name"""
+        import pandas as pd
+        import pyarrow as pa
+
+        frames = []
+        for sheet_name in sheet_names:
+            path = self.path(sheet_name)
+            if not os.path.exists(path):
+                continue
+            with pa.memory_map(path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+                if columns:
+                    table = table.select(columns)
+                frame = table.to_pandas()
+            frame["sheet_name"] = sheet_name
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=(columns or ARCHIVE_COLUMNS) + ["sheet_name"])
+        return pd.concat(frames, ignore_index=True)
+
+    def invalidate(self, sheet_name):
+        """Xóa phân vùng của sheet (khi sheet có thay đổi)"""
+        with self._lock:
+            try:
+                os.remove(self.path(sheet_name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,319 @@
+"""Đo độ trễ và throughput các hàm request của app với server giả lập
+
+Chạy: python benchmark.py --requests 200 --concurrency 4 --latency 0.05
+Đo thời gian khởi động và rerun: python benchmark.py --startup --runs 5
+So sánh định dạng truyền (JSON thường và gzip + bảng cột): python benchmark.py --wire --wire-rows 5000
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from mock_server import start_server
+from wire import WireCodec, dumps
+
+
+def percentile(values, p):
+    """Phân vị p (0-100) theo phương pháp nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def total_retries(metrics):
+    return sum(metrics.snapshot()["retries"].values())
+
+
+def run_scenario(name, func, n, concurrency, server, metrics):
+    """Gọi func(i) n lần với concurrency luồng, trả về thống kê độ trễ"""
+    server.state.reset_stats()
+    # Số retry lấy từ metrics của app: số request tới server còn gồm cả get_capabilities
+    # và get_summary của luồng đối chiếu nền, không phải retry
+    retries_before = total_retries(metrics)
+
+    def timed_call(i):
+        start = time.perf_counter()
+        ok = func(i)
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_call, range(n)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency, _ in results]
+    server_requests = sum(server.state.requests.values())
+    return {
+        "scenario": name,
+        "calls": n,
+        "failures": sum(1 for _, ok in results if not ok),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_per_s": round(n / elapsed, 2) if elapsed else 0.0,
+        "server_requests": server_requests,
+        "retries": total_retries(metrics) - retries_before,
+        "statuses": {str(status): count for status, count in sorted(server.state.statuses.items())}
+    }
+
+
+def sample_transaction(i):
+    return {
+        "date": "2099-01-15",
+        "type": "Chi" if i % 3 else "Thu",
+        "category": "Tiền ăn" if i % 2 else "Khác",
+        "amount": 10000 + i,
+        "note": f"benchmark {i}"
+    }
+
+
+def build_scenarios(app, args):
+    """Danh sách (tên, hàm)"""
+    sheet_name = "01/2099"
+    cache = app.get_summary_cache()
+
+    def send_one(i):
+        data = {
+            "action": "add_transaction",
+            "sheet_name": sheet_name,
+            "transaction": sample_transaction(i)
+        }
+        return app.send_to_sheet(data)[0]
+
+    def send_batch(i):
+        transactions = [sample_transaction(i * args.batch_size + j) for j in range(args.batch_size)]
+        return all(success for success, _ in app.send_batch_to_sheet(sheet_name, transactions))
+
+    def summary_uncached(i):
+        cache.invalidate(app.summary_cache_key(sheet_name))
+        return app.get_summary_data(sheet_name, mode="server")[0]
+
+    def summary_revalidate(i):
+        cache.expire(app.summary_cache_key(sheet_name))
+        return app.get_summary_data(sheet_name, mode="server")[0]
+
+    def summary_cached(i):
+        return app.get_summary_data(sheet_name, mode="server")[0]
+
+    def summary_local(i):
+        return app.get_summary_data(sheet_name, mode="local")[0]
+
+    return [
+        ("test_connection", lambda i: app.test_connection()[0]),
+        ("send_to_sheet", send_one),
+        (f"send_batch_to_sheet x{args.batch_size}", send_batch),
+        ("get_summary_data (miss)", summary_uncached),
+        ("get_summary_data (hit)", summary_cached),
+        ("get_summary_data (revalidate)", summary_revalidate),
+        ("get_summary_data (local delta)", summary_local)
+    ]
+
+
+def startup_probe(reruns):
+    """Chạy trong process mới: đo lần chạy script đầu tiên, các lần rerun và lần mở báo cáo đầu"""
+    from streamlit.testing.v1 import AppTest
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    at = AppTest.from_file(script, default_timeout=60)
+
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    at.radio(key="active_view").set_value("📊 Báo Cáo").run()
+    report_first = time.perf_counter() - start
+
+    print(json.dumps({
+        "first_run_ms": first_run * 1000,
+        "rerun_ms": [t * 1000 for t in rerun_times],
+        "report_first_ms": report_first * 1000,
+        "errors": [str(e.value) for e in at.exception]
+    }))
+
+
+def run_startup_benchmark(url, runs, reruns):
+    """Đo time-to-first-paint (process mới) và thời gian rerun của app"""
+    first_runs = []
+    report_firsts = []
+    rerun_times = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            SHEET_URL_KEY=url,
+            JOURNAL_PATH=os.path.join(tmp, "journal.db"),
+            ARCHIVE_DIR=os.path.join(tmp, "archive")
+        )
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--startup-probe", "--reruns", str(reruns)],
+                capture_output=True, text=True, env=env, check=True
+            ).stdout
+            probe = json.loads(output.strip().splitlines()[-1])
+            if probe["errors"]:
+                raise RuntimeError(probe["errors"])
+            first_runs.append(probe["first_run_ms"])
+            report_firsts.append(probe["report_first_ms"])
+            rerun_times.extend(probe["rerun_ms"])
+
+    return [
+        {"scenario": name, "samples": len(values),
+         "p50_ms": round(percentile(values, 50), 2),
+         "p95_ms": round(percentile(values, 95), 2),
+         "max_ms": round(max(values), 2)}
+        for name, values in [
+            ("first run (cold process)", first_runs),
+            ("rerun", rerun_times),
+            ("first report view", report_firsts)
+        ]
+    ]
+
+
+def run_wire_benchmark(rows, batch_size, repeats):
+    """So sánh số byte trên đường truyền và thời gian mã hóa/giải mã của ghi batch và tải toàn bộ giao dịch"""
+    transactions = [dict(sample_transaction(i), id=f"wire-{i}") for i in range(rows)]
+    results = []
+    for name, compact in [("json", False), ("gzip+columns", True)]:
+        server, url = start_server(compact=compact)
+        session = requests.Session()
+        codec = WireCodec(
+            lambda: session.post(url, data=dumps({"action": "get_capabilities"})).json().get("capabilities", [])
+        )
+
+        encode_ms = 0.0
+        for start in range(0, rows, batch_size):
+            data = {"action": "add_transactions", "sheet_name": "01/2099",
+                    "transactions": transactions[start:start + batch_size]}
+            t = time.perf_counter()
+            body = codec.encode(data)
+            encode_ms += (time.perf_counter() - t) * 1000
+            codec.decode(session.post(url, data=body).json())
+
+        decode_times = []
+        for _ in range(repeats):
+            body = codec.encode({"action": "get_transactions", "sheet_name": "01/2099", "cursor": 0})
+            content = session.post(url, data=body).content
+            t = time.perf_counter()
+            decoded = codec.decode(json.loads(content))
+            decode_times.append((time.perf_counter() - t) * 1000)
+        if len(decoded["transactions"]) != rows:
+            raise RuntimeError(f"{name}: tải về {len(decoded['transactions'])}/{rows} giao dịch")
+
+        results.append({
+            "format": name,
+            "write_bytes": server.state.bytes_in["add_transactions"],
+            "write_encode_ms": round(encode_ms, 2),
+            "read_bytes": server.state.bytes_out["get_transactions"] // repeats,
+            "read_decode_p50_ms": round(percentile(decode_times, 50), 2)
+        })
+        server.shutdown()
+    return results
+
+
+def print_table(results, columns=None):
+    columns = columns or ["scenario", "calls", "failures", "p50_ms", "p95_ms", "p99_ms",
+                          "throughput_per_s", "server_requests", "retries"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).ljust(widths[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các hàm request của app")
+    parser.add_argument("--requests", type=int, default=100, help="Số lần gọi mỗi kịch bản")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--read-timeout", type=float, default=2.0,
+                        help="Read timeout của client khi chạy benchmark (giây)")
+    parser.add_argument("--no-versions", action="store_true",
+                        help="Server giả lập không hỗ trợ version trong get_summary")
+    parser.add_argument("--scenario", action="append", help="Chỉ chạy kịch bản có tên chứa chuỗi này")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup", action="store_true", help="Đo thời gian khởi động và rerun của app")
+    parser.add_argument("--runs", type=int, default=3, help="Số process mới khi đo khởi động")
+    parser.add_argument("--reruns", type=int, default=5, help="Số lần rerun mỗi process khi đo khởi động")
+    parser.add_argument("--wire", action="store_true",
+                        help="So sánh số byte và thời gian giải mã của JSON thường với gzip + bảng cột")
+    parser.add_argument("--wire-rows", type=int, default=2000, help="Số giao dịch khi so sánh định dạng truyền")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_probe:
+        startup_probe(args.reruns)
+        return
+
+    if args.wire:
+        results = run_wire_benchmark(args.wire_rows, args.batch_size, max(args.requests // 10, 1))
+        print_table(results, ["format", "write_bytes", "write_encode_ms", "read_bytes", "read_decode_p50_ms"])
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+
+    server, url = start_server(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_delay=args.read_timeout + 1,
+        versions=not args.no_versions,
+        seed=args.seed
+    )
+    os.environ["SHEET_URL_KEY"] = url
+
+    if args.startup:
+        results = run_startup_benchmark(url, args.runs, args.reruns)
+        print_table(results, ["scenario", "samples", "p50_ms", "p95_ms", "max_ms"])
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        server.shutdown()
+        return
+
+    # Import app sau khi đã có URL; tắt cảnh báo bare mode của Streamlit
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    import app
+
+    for key in app.READ_TIMEOUTS:
+        app.READ_TIMEOUTS[key] = args.read_timeout
+
+    results = []
+    for name, func in build_scenarios(app, args):
+        if args.scenario and not any(s in name for s in args.scenario):
+            continue
+        results.append(run_scenario(name, func, args.requests, args.concurrency, server, app.get_metrics()))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Từ khóa (không phân biệt hoa thường) trong mô tả giao dịch ngân hàng -> danh mục
+DEFAULT_CATEGORY_KEYWORDS = {
+    "Lương": ["luong", "lương", "salary", "payroll"],
+    "Thưởng": ["thuong", "thưởng", "bonus"],
+    "Tiền ăn": ["an uong", "ăn uống", "food", "restaurant", "nha hang", "nhà hàng", "cafe", "coffee"],
+    "Tiền xăng di chuyển": ["xang", "xăng", "petrolimex", "grab", "taxi", "gojek"],
+    "Tiền trọ": ["tien nha", "tiền nhà", "tien tro", "tiền trọ", "thue nha", "thuê nhà"],
+    "Tiền điện": ["tien dien", "tiền điện", "evn"],
+    "Tiền nước": ["tien nuoc", "tiền nước", "cap nuoc", "cấp nước"],
+    "Tiền mạng 4G": ["viettel", "mobifone", "vinaphone", "4g"],
+    "Y tế": ["benh vien", "bệnh viện", "nha thuoc", "nhà thuốc", "pharmacy", "phong kham"],
+    "Mua sắm": ["shopee", "lazada", "tiki", "sieu thi", "siêu thị", "mart"],
+    "Giải trí": ["cgv", "netflix", "spotify", "game"],
+    "Học tập": ["hoc phi", "học phí", "khoa hoc", "khóa học", "udemy"]
+}
+
+# Các giá trị cột loại giao dịch được hiểu là Thu / Chi
+TYPE_ALIASES = {
+    "thu": "Thu", "income": "Thu", "credit": "Thu", "cr": "Thu", "có": "Thu",
+    "chi": "Chi", "expense": "Chi", "debit": "Chi", "dr": "Chi", "nợ": "Chi"
+}
+
+
+def file_fingerprint(fileobj, block_size=1 << 20):
+    """Băm nội dung file theo từng khối và đếm số dòng (không đọc cả file vào bộ nhớ)"""
+    digest = hashlib.sha256()
+    lines = 0
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        if isinstance(block, str):
+            block = block.encode("utf-8")
+        digest.update(block)
+        lines += block.count(b"\n")
+    fileobj.seek(0)
+    return digest.hexdigest(), lines
+
+
+def read_chunks(fileobj, chunksize=IMPORT_CHUNK_SIZE, **read_csv_kwargs):
+    """Đọc CSV theo từng khối chunksize dòng, mọi cột ở dạng chuỗi"""
+    fileobj.seek(0)
+    return pd.read_csv(
+        fileobj,
+        chunksize=chunksize,
+        dtype=str,
+        keep_default_na=False,
+        skipinitialspace=True,
+        **read_csv_kwargs
+    )
+
+
+def parse_amounts(values):
+    """Chuyển cột số tiền dạng chuỗi (1.500.000, 1,500,000.00, -200000 VND...) thành số nguyên"""
+    cleaned = (
+        values.astype(str)
+        .str.replace(r"[^\d\-.,]", "", regex=True)
+        # Phần lẻ 1-2 chữ số sau dấu phân cách cuối là phần thập phân, VNĐ không dùng
+        .str.replace(r"[.,]\d{1,2}$", "", regex=True)
+        .str.replace(r"[.,]", "", regex=True)
+    )
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def parse_dates(values, dayfirst=True):
+    """Chuyển cột ngày dạng chuỗi thành datetime (ngày không hợp lệ -> NaT)"""
+    return pd.to_datetime(values, errors="coerce", dayfirst=dayfirst, format="mixed")
+
+
+def parse_types(values, amounts):
+    """Loại giao dịch từ cột loại; không có cột loại thì dựa vào dấu số tiền (âm là Chi)"""
+    if values is None:
+        return pd.Series(np.where(amounts < 0, "Chi", "Thu"), index=amounts.index)
+    return values.astype(str).str.strip().str.lower().map(TYPE_ALIASES)
+
+
+def map_categories(categories, descriptions, types, income_categories, expense_categories,
+                   keywords=DEFAULT_CATEGORY_KEYWORDS):
+    """Gán danh mục: dùng cột danh mục nếu khớp danh sách, nếu không thì dò từ khóa trong mô tả"""
+    result = pd.Series("Khác", index=types.index, dtype=object)
+    is_income = types == "Thu"
+    is_expense = types == "Chi"
+
+    if descriptions is not None:
+        text = descriptions.astype(str).str.lower()
+        # Duyệt theo danh mục (không theo dòng); danh mục đứng trước được ưu tiên
+        for category, words in reversed(list(keywords.items())):
+            allowed = (is_income & (category in income_categories)) | \
+                      (is_expense & (category in expense_categories))
+            if not allowed.any():
+                continue
+            pattern = "|".join(re.escape(word) for word in words)
+            result = result.mask(allowed & text.str.contains(pattern, regex=True), category)
+
+    if categories is not None:
+        given = categories.astype(str).str.strip()
+        valid = (is_income & given.isin(income_categories)) | (is_expense & given.isin(expense_categories))
+        result = result.mask(valid, given)
+
+    return result
+
+
+def normalize_chunk(chunk, mapping, income_categories, expense_categories, dayfirst=True):
+    """Chuẩn hóa một khối CSV theo mapping cột -> DataFrame giao dịch kèm số dòng và sheet"""
+    def column(key):
+        name = mapping.get(key)
+        return chunk[name] if name else None
+
+    amounts = parse_amounts(chunk[mapping["amount"]])
+    dates = parse_dates(chunk[mapping["date"]], dayfirst=dayfirst)
+    types = parse_types(column("type"), amounts)
+    notes = column("note")
+
+    rows = pd.DataFrame({
+        # Số dòng trong file (tính cả dòng tiêu đề) để báo kết quả từng dòng
+        "row": chunk.index + 2,
+        "date": dates,
+        "type": types,
+        "category": map_categories(column("category"), notes, types, income_categories, expense_categories),
+        "amount": amounts.abs(),
+        "note": notes.astype(str).str.strip().str.slice(0, 200) if notes is not None else ""
+    })
+    rows["sheet_name"] = rows["date"].dt.strftime("%m/%Y")
+    return rows
@@ -0,0 +1,175 @@
+"""Nhập giao dịch và xem báo cáo không qua giao diện Streamlit (script, cron, file lương...)
+
+Nhập từ stdin (JSON Lines hoặc mảng JSON): python headless.py add < transactions.jsonl
+Xem báo cáo dạng JSON:                    python headless.py summary 10/2026
+Chạy HTTP API cục bộ:                     python headless.py serve --port 8600
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def load_app():
+    """Import app.py như một module thường (tắt cảnh báo bare mode của Streamlit)"""
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    import app
+    if not app.SHEET_URL_KEY:
+        raise SystemExit("❌ Chưa cấu hình SHEET_URL_KEY (biến môi trường hoặc --url)")
+    return app
+
+
+def parse_transactions(text):
+    """Đọc danh sách giao dịch từ mảng JSON hoặc JSON Lines (mỗi dòng một object)"""
+    text = text.strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def summarize_results(results):
+    return {"counts": dict(Counter(result["status"] for result in results)), "results": results}
+
+
+def get_summary(app, sheets=(), date_from=None, date_to=None, mode=None):
+    """Báo cáo dạng dict: một sheet, gộp nhiều sheet, hoặc khoảng ngày (date_from/date_to)"""
+    if date_from or date_to:
+        start = date.fromisoformat(date_from) if date_from else app.MIN_DATE
+        end = date.fromisoformat(date_to) if date_to else date.today()
+        result = app.fetch_day_range_summary(start, end)
+        daily = result.pop("daily")
+        result["daily"] = {
+            day.strftime("%Y-%m-%d"): {"Thu": row["Thu"], "Chi": row["Chi"]}
+            for day, row in daily.iterrows() if row["Thu"] or row["Chi"]
+        }
+        return True, result
+    if len(sheets) == 1:
+        return app.fetch_summary(sheets[0], mode)
+    return True, app.fetch_range_summary(list(sheets), mode)
+
+
+class HeadlessHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/health":
+            self._send_json(200, {"ok": True, "journal": app.get_journal().counts()})
+        elif url.path == "/summary":
+            try:
+                success, result = get_summary(
+                    app,
+                    sheets=query.get("sheet", []),
+                    date_from=query.get("from", [None])[0],
+                    date_to=query.get("to", [None])[0],
+                    mode=query.get("mode", [None])[0]
+                )
+            except ValueError as e:
+                self._send_json(400, {"error": True, "message": str(e)})
+                return
+            if not success:
+                self._send_json(502, {"error": True, "message": result})
+                return
+            self._send_json(200, result)
+        else:
+            self._send_json(404, {"error": True, "message": "Not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/transactions":
+            self._send_json(404, {"error": True, "message": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            items = parse_transactions(self.rfile.read(length).decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": True, "message": f"Invalid JSON: {e}"})
+            return
+        if not isinstance(items, list):
+            self._send_json(400, {"error": True, "message": "Body phải là mảng JSON hoặc JSON Lines"})
+            return
+
+        wait = parse_qs(url.query).get("wait", ["1"])[0] != "0"
+        results = self.server.app.ingest_transactions(items, wait=wait)
+        self._send_json(200, summarize_results(results))
+
+
+def create_server(app, host="127.0.0.1", port=8600):
+    server = ThreadingHTTPServer((host, port), HeadlessHandler)
+    server.daemon_threads = True
+    server.app = app
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nhập giao dịch và xem báo cáo không qua giao diện")
+    parser.add_argument("--url", help="URL Google Apps Script (mặc định lấy từ SHEET_URL_KEY)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Nhập giao dịch từ stdin (mảng JSON hoặc JSON Lines)")
+    add.add_argument("--no-wait", action="store_true", help="Chỉ ghi vào nhật ký, không chờ đồng bộ xong")
+
+    summary = commands.add_parser("summary", help="In báo cáo dạng JSON")
+    summary.add_argument("sheets", nargs="*", help="Sheet MM/YYYY (nhiều sheet thì gộp lại)")
+    summary.add_argument("--from", dest="date_from", help="Từ ngày YYYY-MM-DD (báo cáo theo khoảng ngày)")
+    summary.add_argument("--to", dest="date_to", help="Đến ngày YYYY-MM-DD")
+    summary.add_argument("--mode", choices=["server", "local"])
+
+    serve = commands.add_parser("serve", help="Chạy HTTP API cục bộ")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8600)
+
+    args = parser.parse_args()
+    if args.url:
+        os.environ["SHEET_URL_KEY"] = args.url
+    app = load_app()
+
+    if args.command == "add":
+        results = app.ingest_transactions(parse_transactions(sys.stdin.read()), wait=not args.no_wait)
+        output = summarize_results(results)
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+        sys.exit(0 if set(output["counts"]) <= {"synced", "pending"} else 1)
+
+    if args.command == "summary":
+        if not args.sheets and not (args.date_from or args.date_to):
+            args.sheets = [date.today().strftime("%m/%Y")]
+        success, result = get_summary(app, args.sheets, args.date_from, args.date_to, args.mode)
+        if not success:
+            print(json.dumps({"error": True, "message": result}, ensure_ascii=False), file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    server = create_server(app, args.host, args.port)
+    print(f"HTTP API chạy tại http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
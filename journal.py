@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+PENDING = "pending"
+SYNCED = "synced"
+FAILED = "failed"
+
+
+class TransactionJournal:
+    """Nhật ký ghi trước (append-only) lưu giao dịch xuống SQLite trước khi gửi lên server.
+
+    Mỗi dòng lưu cả URL deploy đích, vì nhiều người dùng (hoặc headless.py --url) có thể
+    ghi vào cùng một file nhật ký với các Google Sheet khác nhau.
+    """
+
+    def __init__(self, path="money_journal.db", max_attempts=10, default_url=None):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS journal (
+                    id TEXT PRIMARY KEY,
+                    sheet_url TEXT,
+                    sheet_name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    synced_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal(status, created_at)")
+            # Nhật ký tạo trước khi có cột sheet_url: gán các dòng cũ cho default_url (nếu có),
+            # dòng không rõ URL được giữ lại, không gửi đến URL đoán bừa
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(journal)")]
+            if "sheet_url" not in columns:
+                conn.execute("ALTER TABLE journal ADD COLUMN sheet_url TEXT")
+            if default_url:
+                conn.execute("UPDATE journal SET sheet_url = ? WHERE sheet_url IS NULL", (default_url,))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, sheet_name, transaction, sheet_url):
+        """Ghi giao dịch (gửi đến sheet_url) vào nhật ký, trả về id dùng làm idempotency key"""
+        entry_id = uuid.uuid4().hex
+        transaction = dict(transaction, id=entry_id)
+        with self._connect() as conn:
+            conn.execute(
+                """INSERT INTO journal (id, sheet_url, sheet_name, payload, status, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (entry_id, sheet_url, sheet_name, json.dumps(transaction, ensure_ascii=False), PENDING, time.time())
+            )
+        return entry_id
+
+    def append_many(self, entries, sheet_url):
+        """Ghi nhiều giao dịch với id cho trước [(id, sheet_name, transaction)], bỏ qua id đã có"""
+        now = time.time()
+        rows = [
+            (entry_id, sheet_url, sheet_name,
+             json.dumps(dict(transaction, id=entry_id), ensure_ascii=False), PENDING, now)
+            for entry_id, sheet_name, transaction in entries
+        ]
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                """INSERT OR IGNORE INTO journal (id, sheet_url, sheet_name, payload, status, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            return conn.total_changes - before
+
+    def pending(self, limit=200):
+        """Danh sách giao dịch chưa đồng bộ (id, sheet_url, sheet_name, giao dịch), theo thứ tự ghi"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT id, sheet_url, sheet_name, payload FROM journal
+                   WHERE status = ? AND sheet_url IS NOT NULL ORDER BY created_at LIMIT ?""",
+                (PENDING, limit)
+            ).fetchall()
+        return [
+            (entry_id, sheet_url, sheet_name, json.loads(payload))
+            for entry_id, sheet_url, sheet_name, payload in rows
+        ]
+
+    def mark_synced(self, entry_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE journal SET status = ?, synced_at = ?, last_error = NULL WHERE id = ?",
+                (SYNCED, time.time(), entry_id)
+            )
+
+    def mark_error(self, entry_id, error):
+        """Ghi nhận lỗi; quá số lần thử thì chuyển sang trạng thái failed"""
+        with self._connect() as conn:
+            conn.execute(
+                """UPDATE journal
+                   SET attempts = attempts + 1,
+                       last_error = ?,
+                       status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END
+                   WHERE id = ?""",
+                (error, self.max_attempts, FAILED, entry_id)
+            )
+
+    def retry_failed(self):
+        """Đưa các giao dịch failed về lại hàng chờ đồng bộ"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE journal SET status = ?, attempts = 0 WHERE status = ?",
+                (PENDING, FAILED)
+            )
+
+    def statuses(self, entry_ids):
+        """Trạng thái của các giao dịch theo id"""
+        if not entry_ids:
+            return {}
+        placeholders = ", ".join("?" * len(entry_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, sheet_name, payload, status, last_error FROM journal WHERE id IN ({placeholders})",
+                list(entry_ids)
+            ).fetchall()
+        return {
+            entry_id: {
+                "sheet_name": sheet_name,
+                "transaction": json.loads(payload),
+                "status": status,
+                "last_error": last_error
+            }
+            for entry_id, sheet_name, payload, status, last_error in rows
+        }
+
+    def counts(self):
+        """Số giao dịch theo từng trạng thái"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall()
+        counts = {PENDING: 0, SYNCED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class JournalSyncWorker:
+    """Luồng nền đẩy các giao dịch pending trong nhật ký lên server"""
+
+    def __init__(self, journal, submit, interval=5.0, paused=None):
+        # submit(sheet_name, transaction, sheet_url) -> Future chứa (thành công, thông báo)
+        # paused(sheet_url) -> True thì bỏ qua giao dịch của URL đó trong lượt này
+        # (server đang lỗi), không tính là lần thử
+        self.journal = journal
+        self._submit = submit
+        self._paused = paused
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="journal-sync", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Đánh thức worker để đồng bộ ngay"""
+        self._wakeup.set()
+
+    def sync_once(self):
+        """Đồng bộ một lượt, trả về số giao dịch đã đồng bộ thành công"""
+        # Chỉ một lượt đồng bộ tại một thời điểm để không gửi trùng giao dịch
+        with self._sync_lock:
+            entries = self.journal.pending()
+            paused = {}
+            futures = []
+            for entry_id, sheet_url, sheet_name, transaction in entries:
+                if self._paused:
+                    if sheet_url not in paused:
+                        paused[sheet_url] = self._paused(sheet_url)
+                    if paused[sheet_url]:
+                        continue
+                futures.append((entry_id, self._submit(sheet_name, transaction, sheet_url)))
+
+            synced = 0
+            for entry_id, future in futures:
+                success, message = future.result()
+                if success:
+                    self.journal.mark_synced(entry_id)
+                    synced += 1
+                else:
+                    self.journal.mark_error(entry_id, message)
+            return synced
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.sync_once()
+            except Exception:
+                # Lỗi tạm thời (ổ đĩa, mạng...) sẽ được thử lại ở lượt sau
+                time.sleep(self.interval)
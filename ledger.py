@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+LEDGER_FILTER_FIELDS = ["type", "category", "date_from", "date_to"]
+
+
+def match_filters(row, filters):
+    """Giao dịch có khớp bộ lọc loại, danh mục và khoảng ngày (YYYY-MM-DD) không"""
+    if filters.get("type") and row.get("type") != filters["type"]:
+        return False
+    if filters.get("category") and row.get("category") != filters["category"]:
+        return False
+    day = str(row.get("date", ""))[:10]
+    if filters.get("date_from") and day < filters["date_from"]:
+        return False
+    if filters.get("date_to") and day > filters["date_to"]:
+        return False
+    return True
+
+
+def filter_page(rows, cursor, limit, filters):
+    """Lọc và cắt trang tại máy từ các dòng kể từ cursor (dùng khi server chưa hỗ trợ phân trang).
+
+    Trả về (các dòng của trang, cursor của trang sau, còn trang sau không).
+    """
+    page = []
+    for offset, row in enumerate(rows):
+        if not match_filters(row, filters):
+            continue
+        page.append(row)
+        if len(page) == limit:
+            next_cursor = cursor + offset + 1
+            return page, next_cursor, next_cursor < cursor + len(rows)
+    return page, cursor + len(rows), False
+
+
+class LedgerPager:
+    """Tải sổ giao dịch theo trang, giữ các trang gần đây và tải trước trang kế tiếp ở luồng nền"""
+
+    def __init__(self, fetch_page, executor, ttl=300, max_pages=64):
+        # fetch_page(sheet_name, cursor, limit, filters) -> (các dòng, cursor sau, còn trang sau)
+        self._fetch_page = fetch_page
+        self._executor = executor
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(sheet_name, cursor, limit, filters):
+        return (sheet_name, cursor, limit, tuple(filters.get(f) for f in LEDGER_FILTER_FIELDS))
+
+    def _cached(self, key):
+        entry = self._pages.get(key)
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            return None
+        self._pages.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, page):
+        with self._lock:
+            self._pages[key] = (page, time.time())
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            self._inflight.pop(key, None)
+
+    def _load(self, key, sheet_name, cursor, limit, filters):
+        try:
+            page = self._fetch_page(sheet_name, cursor, limit, filters)
+        except Exception:
+            with self._lock:
+                self._inflight.pop(key, None)
+            raise
+        self._store(key, page)
+        return page
+
+    def page(self, sheet_name, cursor, limit, filters):
+        """Trang bắt đầu từ cursor: lấy từ bộ nhớ, chờ lượt tải trước đang chạy, hoặc tải ngay"""
+        key = self._key(sheet_name, cursor, limit, filters)
+        with self._lock:
+            page = self._cached(key)
+            future = self._inflight.get(key)
+        if page is not None:
+            return page
+        if future is not None:
+            return future.result()
+        return self._load(key, sheet_name, cursor, limit, filters)
+
+    def prefetch(self, sheet_name, cursor, limit, filters):
+        """Tải trước trang bắt đầu từ cursor ở luồng nền (bỏ qua nếu đã có hoặc đang tải)"""
+        key = self._key(sheet_name, cursor, limit, filters)
+        with self._lock:
+            if self._cached(key) is not None or key in self._inflight:
+                return
+            self._inflight[key] = self._executor.submit(self._load, key, sheet_name, cursor, limit, filters)
+
+    def invalidate(self, sheet_name=None):
+        """Xóa các trang đã lưu của một sheet (hoặc tất cả)"""
+        with self._lock:
+            for key in [k for k in self._pages if sheet_name is None or k[0] == sheet_name]:
+                del self._pages[key]
@@ -0,0 +1,76 @@
+import threading
+
+import pandas as pd
+
+TRANSACTION_COLUMNS = ["date", "type", "category", "amount", "note"]
+
+
+def _native(value):
+    """Chuyển số numpy về kiểu Python để dữ liệu báo cáo giống JSON từ server"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def compute_summary(df):
+    """Tính báo cáo (cùng cấu trúc với get_summary của server) từ DataFrame giao dịch"""
+    if df.empty:
+        return {"total_income": 0, "total_expense": 0, "expense_by_category": {}}
+
+    amount = pd.to_numeric(df["amount"], errors="coerce").fillna(0)
+    is_income = df["type"] == "Thu"
+    is_expense = df["type"] == "Chi"
+
+    expense_by_category = amount[is_expense].groupby(df.loc[is_expense, "category"]).sum()
+    return {
+        "total_income": _native(amount[is_income].sum()),
+        "total_expense": _native(amount[is_expense].sum()),
+        "expense_by_category": {
+            category: _native(value) for category, value in expense_by_category.items()
+        }
+    }
+
+
+class LocalSummaryEngine:
+    """Giữ giao dịch thô theo sheet, chỉ tải phần mới theo cursor và tính báo cáo tại chỗ"""
+
+    def __init__(self, fetch_rows):
+        # fetch_rows(sheet_name, cursor) -> (danh sách giao dịch, cursor mới)
+        self._fetch_rows = fetch_rows
+        self._frames = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def sync(self, sheet_name):
+        """Tải các dòng mới kể từ cursor lần trước, trả về số dòng mới"""
+        with self._lock:
+            cursor = self._cursors.get(sheet_name, 0)
+            rows, next_cursor = self._fetch_rows(sheet_name, cursor)
+
+            if rows:
+                delta = pd.DataFrame(rows).reindex(columns=TRANSACTION_COLUMNS)
+                current = self._frames.get(sheet_name)
+                self._frames[sheet_name] = (
+                    delta if current is None else pd.concat([current, delta], ignore_index=True)
+                )
+            self._cursors[sheet_name] = next_cursor
+            return len(rows)
+
+    def frame(self, sheet_name):
+        """DataFrame giao dịch đã đồng bộ của sheet"""
+        with self._lock:
+            df = self._frames.get(sheet_name)
+            return df if df is not None else pd.DataFrame(columns=TRANSACTION_COLUMNS)
+
+    def summary(self, sheet_name):
+        """Đồng bộ phần mới rồi tính báo cáo của sheet"""
+        self.sync(sheet_name)
+        return compute_summary(self.frame(sheet_name))
+
+    def reset(self, sheet_name=None):
+        """Xóa dữ liệu đã đồng bộ để tải lại từ đầu"""
+        with self._lock:
+            if sheet_name is None:
+                self._frames.clear()
+                self._cursors.clear()
+            else:
+                self._frames.pop(sheet_name, None)
+                self._cursors.pop(sheet_name, None)
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class Timing:
+    """Thống kê thời gian của một loại thao tác (giữ mẫu gần nhất để tính phân vị)"""
+
+    def __init__(self, max_samples=500):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2)
+        }
+
+
+class Metrics:
+    """Lớp đo đạc chung: thời gian request, retry, mã HTTP, cache hit/miss và các pha rerun"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.statuses = Counter()
+            self.retries = Counter()
+            self.backoff_seconds = Counter()
+            self.cache = {}
+            self.reconcile = Counter()
+            self.phases = {}
+            self.started_at = time.time()
+
+    def record_request(self, action, seconds, status):
+        """Ghi nhận một request HTTP (status là mã HTTP hoặc 'timeout'/'error')"""
+        with self._lock:
+            self.requests.setdefault(action, Timing()).add(seconds)
+            self.statuses[str(status)] += 1
+
+    def record_retry(self, action, backoff):
+        """Ghi nhận một lần retry và thời gian chờ trước khi thử lại"""
+        with self._lock:
+            self.retries[action] += 1
+            self.backoff_seconds[action] += backoff
+
+    def record_cache(self, name, hit):
+        with self._lock:
+            stats = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def record_reconcile(self, result):
+        """Ghi nhận kết quả đối chiếu báo cáo với server (match/mismatch/error)"""
+        with self._lock:
+            self.reconcile[result] += 1
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            self.phases.setdefault(name, Timing()).add(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """Đo thời gian một pha của lần chạy script (config, fetch, dataframe, chart...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Toàn bộ số liệu dưới dạng dict (dùng cho JSON và hiển thị)"""
+        with self._lock:
+            cache = {}
+            for name, stats in self.cache.items():
+                total = stats["hits"] + stats["misses"]
+                cache[name] = dict(stats, hit_ratio=round(stats["hits"] / total, 4) if total else 0.0)
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "requests": {action: timing.snapshot() for action, timing in self.requests.items()},
+                "http_statuses": dict(self.statuses),
+                "retries": dict(self.retries),
+                "backoff_seconds": {action: round(s, 3) for action, s in self.backoff_seconds.items()},
+                "cache": cache,
+                "reconcile": dict(self.reconcile),
+                "phases": {name: timing.snapshot() for name, timing in self.phases.items()}
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="money_app"):
+        """Xuất số liệu theo định dạng text của Prometheus"""
+        with self._lock:
+            lines = [
+                f"# TYPE {prefix}_request_seconds summary",
+            ]
+            for action, timing in self.requests.items():
+                lines.append(f'{prefix}_request_seconds_count{{action="{action}"}} {timing.count}')
+                lines.append(f'{prefix}_request_seconds_sum{{action="{action}"}} {timing.total:.6f}')
+            lines.append(f"# TYPE {prefix}_http_responses_total counter")
+            for status, count in self.statuses.items():
+                lines.append(f'{prefix}_http_responses_total{{status="{status}"}} {count}')
+            lines.append(f"# TYPE {prefix}_retries_total counter")
+            for action, count in self.retries.items():
+                lines.append(f'{prefix}_retries_total{{action="{action}"}} {count}')
+            lines.append(f"# TYPE {prefix}_backoff_seconds_total counter")
+            for action, seconds in self.backoff_seconds.items():
+                lines.append(f'{prefix}_backoff_seconds_total{{action="{action}"}} {seconds:.6f}')
+            lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+            for name, stats in self.cache.items():
+                lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+                lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+            lines.append(f"# TYPE {prefix}_reconcile_total counter")
+            for result, count in self.reconcile.items():
+                lines.append(f'{prefix}_reconcile_total{{result="{result}"}} {count}')
+            lines.append(f"# TYPE {prefix}_phase_seconds summary")
+            for name, timing in self.phases.items():
+                lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {timing.count}')
+                lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {timing.total:.6f}')
+            return "\n".join(lines) + "\n"
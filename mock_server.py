@@ -0,0 +1,264 @@
+"""Server giả lập Google Apps Script để đo hiệu năng và kiểm thử offline
+
+Chạy: python mock_server.py --port 8765 --latency 0.2 --rate-limit 0.05
+Rồi đặt SHEET_URL_KEY=http://127.0.0.1:8765 khi chạy app.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ledger import filter_page
+from wire import WIRE_CAPABILITIES, columns_to_rows, dumps, pack, rows_to_columns, unpack
+
+# Response nhỏ hơn ngưỡng này không được nén (như WIRE_GZIP_MIN_BYTES của app)
+GZIP_MIN_BYTES = 1024
+
+
+class StandInConfig:
+    """Cấu hình độ trễ và lỗi giả lập"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=0.0, timeout_rate=0.0,
+                 timeout_delay=65.0, error_rate=0.0, retry_after=None, versions=True,
+                 compact=True, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.error_rate = error_rate
+        # Giá trị header Retry-After gửi kèm 429/503 (None để không gửi)
+        self.retry_after = retry_after
+        # False để giả lập server cũ không hỗ trợ version trong get_summary
+        self.versions = versions
+        # False để giả lập server cũ chỉ nhận JSON thường (không có get_capabilities)
+        self.compact = compact
+        self.random = random.Random(seed)
+
+
+class StandInState:
+    """Dữ liệu các sheet và thống kê request của server giả lập"""
+
+    def __init__(self):
+        self.sheets = {}
+        self.seen_ids = set()
+        # Version của sheet = mã phiên server + số lần sheet thay đổi
+        self.epoch = uuid.uuid4().hex[:8]
+        self.revisions = Counter()
+        self.requests = Counter()
+        self.statuses = Counter()
+        # Số byte body nhận / gửi theo action (để so sánh định dạng truyền)
+        self.bytes_in = Counter()
+        self.bytes_out = Counter()
+        self.lock = threading.Lock()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests.clear()
+            self.statuses.clear()
+            self.bytes_in.clear()
+            self.bytes_out.clear()
+
+    def add_transaction(self, sheet_name, transaction):
+        """Thêm một dòng, bỏ qua nếu id (idempotency key) đã được ghi"""
+        with self.lock:
+            entry_id = transaction.get("id")
+            if entry_id:
+                if entry_id in self.seen_ids:
+                    return {"success": True, "duplicate": True}
+                self.seen_ids.add(entry_id)
+            self.sheets.setdefault(sheet_name, []).append(dict(transaction))
+            self.revisions[sheet_name] += 1
+            return {"success": True}
+
+    def rows(self, sheet_name):
+        with self.lock:
+            return list(self.sheets.get(sheet_name, []))
+
+    def version(self, sheet_name):
+        with self.lock:
+            return f"{self.epoch}-{self.revisions[sheet_name]}"
+
+    def summary(self, sheet_name):
+        total_income = 0
+        total_expense = 0
+        expense_by_category = {}
+        for row in self.rows(sheet_name):
+            amount = row.get("amount", 0)
+            if row.get("type") == "Thu":
+                total_income += amount
+            elif row.get("type") == "Chi":
+                total_expense += amount
+                category = row.get("category", "Khác")
+                expense_by_category[category] = expense_by_category.get(category, 0) + amount
+        return {
+            "success": True,
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "expense_by_category": expense_by_category
+        }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        with self.server.state.lock:
+            self.server.state.statuses[status] += 1
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def do_POST(self):
+        config = self.server.config
+        state = self.server.state
+
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        try:
+            data = json.loads(raw or b"{}")
+            if config.compact:
+                data = unpack(data)
+        except ValueError:
+            self._send_json(400, {"error": True, "message": "Invalid JSON"})
+            return
+
+        action = data.get("action", "")
+        with state.lock:
+            state.requests[action] += 1
+            state.bytes_in[action] += len(raw)
+
+        # Độ trễ và lỗi giả lập
+        delay = config.latency + config.random.uniform(0, config.jitter)
+        if delay:
+            time.sleep(delay)
+
+        roll = config.random.random()
+        if roll < config.timeout_rate:
+            time.sleep(config.timeout_delay)
+        elif roll < config.timeout_rate + config.rate_limit:
+            headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else None
+            self._send_json(429, {"error": True, "message": "Rate limit exceeded"}, headers)
+            return
+        elif roll < config.timeout_rate + config.rate_limit + config.error_rate:
+            self._send_json(500, {"error": True, "message": "Injected server error"})
+            return
+
+        result = self.handle_action(action, data)
+        if config.compact and data.get("accept_encoding") == "gzip":
+            if len(dumps(result).encode("utf-8")) >= GZIP_MIN_BYTES:
+                result = pack(dict(result, action=action))
+        sent = self._send_json(200, result)
+        with state.lock:
+            state.bytes_out[action] += sent
+
+    def handle_action(self, action, data):
+        state = self.server.state
+        sheet_name = data.get("sheet_name", "")
+        compact = self.server.config.compact
+
+        if action == "test_connection":
+            return {"success": True, "message": "Connected"}
+        if action == "get_capabilities" and compact:
+            return {"success": True, "capabilities": WIRE_CAPABILITIES}
+        if action == "add_transaction":
+            return state.add_transaction(sheet_name, data.get("transaction", {}))
+        if action == "add_transactions":
+            transactions = data.get("transactions")
+            if transactions is None and compact and "columns" in data:
+                transactions = columns_to_rows(data["columns"])
+            results = [state.add_transaction(sheet_name, t) for t in transactions or []]
+            return {"success": True, "results": results}
+        if action == "get_summary":
+            if not self.server.config.versions:
+                return state.summary(sheet_name)
+            version = state.version(sheet_name)
+            if data.get("version") == version:
+                return {"success": True, "unchanged": True, "version": version}
+            return dict(state.summary(sheet_name), version=version)
+        if action == "get_transactions":
+            rows = state.rows(sheet_name)
+            cursor = int(data.get("cursor", 0))
+            limit = data.get("limit")
+            if not limit:
+                result = {"success": True, "transactions": rows[cursor:], "next_cursor": len(rows)}
+            else:
+                page, next_cursor, has_more = filter_page(rows[cursor:], cursor, int(limit), data.get("filters") or {})
+                result = {"success": True, "transactions": page, "next_cursor": next_cursor, "has_more": has_more}
+            if compact and data.get("format") == "columns":
+                result["columns"] = rows_to_columns(result.pop("transactions"))
+            return result
+        return {"error": True, "message": f"Unknown action: {action}"}
+
+
+def create_server(host="127.0.0.1", port=0, **config):
+    """Tạo server giả lập (port=0 để tự chọn port trống)"""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.config = StandInConfig(**config)
+    server.state = StandInState()
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, **config):
+    """Chạy server giả lập trong luồng nền, trả về (server, url)"""
+    server = create_server(host, port, **config)
+    thread = threading.Thread(target=server.serve_forever, name="stand-in-server", daemon=True)
+    thread.start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server giả lập Google Apps Script")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Độ trễ cố định (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Độ trễ ngẫu nhiên thêm tối đa (giây)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Tỷ lệ request trả về 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Tỷ lệ request bị treo")
+    parser.add_argument("--timeout-delay", type=float, default=65.0, help="Thời gian treo (giây)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỷ lệ request trả về 500")
+    parser.add_argument("--retry-after", type=float, default=None, help="Giá trị header Retry-After kèm 429 (giây)")
+    parser.add_argument("--no-versions", action="store_true",
+                        help="Giả lập server cũ: get_summary không hỗ trợ version")
+    parser.add_argument("--no-compact", action="store_true",
+                        help="Giả lập server cũ: chỉ nhận JSON thường, không có get_capabilities")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        timeout_rate=args.timeout_rate,
+        timeout_delay=args.timeout_delay,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        versions=not args.no_versions,
+        compact=not args.no_compact,
+        seed=args.seed
+    )
+    print(f"Server giả lập chạy tại http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import Counter, deque
+
+
+class SummaryPrefetcher:
+    """Luồng nền làm nóng báo cáo của các tháng người dùng có thể mở tiếp theo.
+
+    Mỗi lần schedule thay toàn bộ hàng đợi cũ (các mục chưa chạy bị hủy), các request
+    cách nhau ít nhất `interval` giây, và lượt tải bị bỏ qua khi paused() trả về True
+    (ví dụ circuit breaker đang mở) để không cạnh tranh với thao tác của người dùng.
+    """
+
+    def __init__(self, prefetch, interval=1.0, paused=None):
+        # prefetch(target) -> True nếu đã phải gửi request, False nếu dữ liệu đã có sẵn
+        self._prefetch = prefetch
+        self.interval = interval
+        self._paused = paused
+        self._queue = deque()
+        self._opens = Counter()
+        self._next_at = 0.0
+        self._cond = threading.Condition()
+        self.stats = Counter()
+        self._thread = threading.Thread(target=self._run, name="summary-prefetch", daemon=True)
+        self._thread.start()
+
+    def record_open(self, sheet_name):
+        """Ghi nhận người dùng mở báo cáo của sheet (để ưu tiên các tháng hay xem)"""
+        with self._cond:
+            self._opens[sheet_name] += 1
+
+    def frequent(self, n, exclude=()):
+        """n sheet được mở nhiều nhất, bỏ qua các sheet trong exclude"""
+        with self._cond:
+            ranked = [name for name, _ in self._opens.most_common() if name not in exclude]
+        return ranked[:n]
+
+    def schedule(self, targets):
+        """Thay hàng đợi bằng các mục mới theo thứ tự ưu tiên"""
+        with self._cond:
+            self.stats["cancelled"] += len(self._queue)
+            self._queue = deque(dict.fromkeys(targets))
+            self.stats["scheduled"] += len(self._queue)
+            self._cond.notify()
+
+    def cancel(self):
+        """Hủy các mục chưa chạy"""
+        with self._cond:
+            self.stats["cancelled"] += len(self._queue)
+            self._queue.clear()
+
+    def pending(self):
+        with self._cond:
+            return list(self._queue)
+
+    def _next_target(self):
+        with self._cond:
+            while True:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                wait = self._next_at - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                return self._queue.popleft()
+
+    def _run(self):
+        while True:
+            target = self._next_target()
+            if self._paused and self._paused():
+                self.stats["paused"] += 1
+                continue
+            try:
+                sent = self._prefetch(target)
+                self.stats["fetched" if sent else "skipped"] += 1
+            except Exception:
+                sent = True
+                self.stats["failed"] += 1
+            if sent:
+                with self._cond:
+                    self._next_at = time.monotonic() + self.interval
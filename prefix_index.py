@@ -0,0 +1,179 @@
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+class PrefixSumIndex:
+    """Chỉ mục tổng cộng dồn theo ngày cho từng cặp (loại, danh mục).
+
+    Cột d của ma trận _cumulative là tổng số tiền từ ngày gốc đến hết ngày d, nên tổng
+    của một khoảng ngày bất kỳ chỉ cần hai lần tra: cum[end] - cum[start - 1]. Giao dịch
+    được nạp theo sheet MM/YYYY; mỗi sheet giữ lại danh sách (dòng, ngày, số tiền) đã nạp
+    để có thể gỡ ra khi sheet cần tải lại, cùng các id đã cộng qua add() để giao dịch
+    gửi lại (cùng id) không bị cộng hai lần. Sheet đã nạp quá `ttl` giây được coi như
+    chưa nạp để lần xem sau tải lại (có giao dịch ghi từ process/thiết bị khác).
+    """
+
+    def __init__(self, origin=date(2020, 1, 1), initial_days=366, ttl=None):
+        self.origin = origin
+        self.ttl = ttl
+        self._loaded_at = {}
+        self._series = {}
+        self._cumulative = np.zeros((8, initial_days))
+        self._sheets = {}
+        self._added_ids = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, sheet_name):
+        if sheet_name not in self._sheets:
+            return False
+        return self.ttl is None or time.monotonic() - self._loaded_at[sheet_name] < self.ttl
+
+    def has(self, sheet_name):
+        with self._lock:
+            return self._fresh(sheet_name)
+
+    def sheets(self):
+        with self._lock:
+            return list(self._sheets)
+
+    def _day(self, value):
+        return (value - self.origin).days
+
+    def _encode(self, frame):
+        """DataFrame (date, type, category, amount) -> mảng (dòng, ngày, số tiền) hợp lệ"""
+        dates = pd.to_datetime(frame["date"], errors="coerce", format="mixed")
+        amounts = pd.to_numeric(frame["amount"], errors="coerce")
+        valid = dates.notna() & amounts.notna() & frame["type"].isin(["Thu", "Chi"])
+        # Ngày trước ngày gốc nằm ngoài chỉ mục
+        valid &= dates.dt.normalize() >= pd.Timestamp(self.origin)
+        days = (dates[valid].dt.normalize() - pd.Timestamp(self.origin)).dt.days.to_numpy()
+
+        # Chỉ đăng ký (loại, danh mục) của các dòng được giữ lại, để số series không vượt
+        # số dòng của ma trận khi _apply không có gì để cộng (và không gọi _grow)
+        keys = zip(frame.loc[valid, "type"], frame.loc[valid, "category"].fillna("Khác"))
+        rows = np.array([self._series.setdefault(key, len(self._series)) for key in keys], dtype=np.int64)
+        return rows, days, amounts[valid].to_numpy(dtype=float)
+
+    def _grow(self, last_day):
+        """Mở rộng ma trận (gấp đôi) để chứa đủ số dòng và ngày"""
+        n_rows, n_days = self._cumulative.shape
+        new_rows, new_days = n_rows, n_days
+        while new_rows < len(self._series):
+            new_rows *= 2
+        while new_days <= last_day:
+            new_days *= 2
+        if (new_rows, new_days) == (n_rows, n_days):
+            return
+        grown = np.zeros((new_rows, new_days))
+        grown[:n_rows, :n_days] = self._cumulative
+        # Các ngày mới ở sau cùng mang giá trị cộng dồn của ngày cuối cũ
+        grown[:n_rows, n_days:] = self._cumulative[:, -1:]
+        self._cumulative = grown
+
+    def _apply(self, rows, days, amounts):
+        if not len(rows):
+            return
+        self._grow(int(days.max()))
+        first = int(days.min())
+        daily = np.zeros((self._cumulative.shape[0], self._cumulative.shape[1] - first))
+        np.add.at(daily, (rows, days - first), amounts)
+        self._cumulative[:, first:] += daily.cumsum(axis=1)
+
+    def load(self, sheet_name, frame):
+        """Nạp toàn bộ giao dịch của một sheet (bỏ qua nếu sheet đã được nạp và chưa hết hạn)"""
+        with self._lock:
+            if self._fresh(sheet_name):
+                return
+            self._remove(sheet_name)
+            encoded = self._encode(frame)
+            self._apply(*encoded)
+            self._sheets[sheet_name] = [encoded]
+            self._loaded_at[sheet_name] = time.monotonic()
+
+    def add(self, sheet_name, transactions):
+        """Cộng dồn giao dịch mới vào sheet đã nạp, trả về False nếu sheet chưa được nạp"""
+        with self._lock:
+            if sheet_name not in self._sheets:
+                return False
+            seen = self._added_ids.setdefault(sheet_name, set())
+            fresh = []
+            for transaction in transactions:
+                entry_id = transaction.get("id")
+                if entry_id in seen:
+                    continue
+                if entry_id:
+                    seen.add(entry_id)
+                fresh.append(transaction)
+            if not fresh:
+                return True
+            frame = pd.DataFrame(fresh).reindex(columns=["date", "type", "category", "amount"])
+            encoded = self._encode(frame)
+            self._apply(*encoded)
+            self._sheets[sheet_name].append(encoded)
+            return True
+
+    def drop(self, sheet_name=None):
+        """Gỡ giao dịch của một sheet (hoặc tất cả) khỏi chỉ mục"""
+        with self._lock:
+            if sheet_name is None:
+                self._series.clear()
+                self._cumulative = np.zeros((8, self._cumulative.shape[1]))
+                self._sheets.clear()
+                self._added_ids.clear()
+                self._loaded_at.clear()
+                return
+            self._remove(sheet_name)
+
+    def _remove(self, sheet_name):
+        self._added_ids.pop(sheet_name, None)
+        self._loaded_at.pop(sheet_name, None)
+        for rows, days, amounts in self._sheets.pop(sheet_name, []):
+            self._apply(rows, days, -amounts)
+
+    def _range_columns(self, start, end):
+        """Cột cộng dồn tại end và ngay trước start (ngoài phạm vi -> 0 hoặc ngày cuối)"""
+        last = self._cumulative.shape[1] - 1
+        start_day = self._day(start)
+        end_day = min(self._day(end), last)
+        zeros = np.zeros(self._cumulative.shape[0])
+        if end_day < 0 or start_day > end_day:
+            return zeros, zeros
+        before = self._cumulative[:, start_day - 1] if start_day > 0 else zeros
+        return self._cumulative[:, end_day], before
+
+    def totals(self, start, end):
+        """Tổng theo (loại, danh mục) từ ngày start đến hết ngày end (cả hai đầu)"""
+        with self._lock:
+            at_end, before = self._range_columns(start, end)
+            sums = at_end - before
+            return {key: float(sums[row]) for key, row in self._series.items() if sums[row]}
+
+    def summary(self, start, end):
+        """Báo cáo cho khoảng ngày, cùng cấu trúc với get_summary của server"""
+        totals = self.totals(start, end)
+        expense_by_category = {
+            category: amount for (kind, category), amount in totals.items() if kind == "Chi"
+        }
+        return {
+            "total_income": sum(amount for (kind, _), amount in totals.items() if kind == "Thu"),
+            "total_expense": sum(expense_by_category.values()),
+            "expense_by_category": expense_by_category
+        }
+
+    def daily(self, start, end):
+        """Tổng Thu/Chi từng ngày trong khoảng (DataFrame theo ngày)"""
+        index = pd.date_range(start, end, freq="D")
+        with self._lock:
+            last = self._cumulative.shape[1] - 1
+            days = np.clip(np.arange(self._day(start) - 1, self._day(end) + 1), -1, last)
+            cumulative = np.where(days >= 0, self._cumulative[:, np.maximum(days, 0)], 0)
+            per_day = np.diff(cumulative, axis=1)
+            columns = {}
+            for kind in ["Thu", "Chi"]:
+                rows = [row for (k, _), row in self._series.items() if k == kind]
+                columns[kind] = per_day[rows].sum(axis=0) if rows else np.zeros(len(index))
+        return pd.DataFrame(columns, index=index)
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import Counter, deque
+
+
+def apply_transactions(summary, transactions):
+    """Cộng các giao dịch mới vào báo cáo (cấu trúc get_summary), trả về bản sao đã cập nhật"""
+    updated = dict(summary)
+    by_category = dict(updated.get("expense_by_category") or {})
+    for transaction in transactions:
+        amount = transaction.get("amount") or 0
+        if transaction.get("type") == "Thu":
+            updated["total_income"] = updated.get("total_income", 0) + amount
+        elif transaction.get("type") == "Chi":
+            updated["total_expense"] = updated.get("total_expense", 0) + amount
+            category = transaction.get("category") or "Khác"
+            by_category[category] = by_category.get(category, 0) + amount
+    updated["expense_by_category"] = by_category
+    # Chưa được server xác nhận, sẽ được thay bằng bản của server khi đối chiếu
+    updated["unconfirmed"] = True
+    return updated
+
+
+def summary_diff(local, server, tolerance=0.5):
+    """Các giá trị khác nhau giữa báo cáo tại máy và của server: {tên: (tại máy, server)}"""
+    diff = {}
+    for field in ["total_income", "total_expense"]:
+        local_value = local.get(field) or 0
+        server_value = server.get(field) or 0
+        if abs(local_value - server_value) > tolerance:
+            diff[field] = (local_value, server_value)
+
+    local_categories = local.get("expense_by_category") or {}
+    server_categories = server.get("expense_by_category") or {}
+    for category in set(local_categories) | set(server_categories):
+        local_value = local_categories.get(category) or 0
+        server_value = server_categories.get(category) or 0
+        if abs(local_value - server_value) > tolerance:
+            diff[f"expense_by_category.{category}"] = (local_value, server_value)
+    return diff
+
+
+class SummaryReconciler:
+    """Cập nhật lạc quan báo cáo đã cache khi ghi, rồi đối chiếu nền với server.
+
+    Mỗi lần ghi hẹn một lượt đối chiếu sau `delay` giây (các lần ghi liền nhau của cùng
+    sheet được gộp). Nếu có giao dịch mới được áp dụng trong lúc đang tải báo cáo của
+    server, lượt đối chiếu được hẹn lại để không báo lệch nhầm.
+    """
+
+    def __init__(self, cache, fetch, delay=2.0, on_result=None, max_mismatches=20):
+        # fetch(key) -> (thành công, báo cáo của server)
+        self.cache = cache
+        self.delay = delay
+        self._fetch = fetch
+        self._on_result = on_result
+        self._due = {}
+        self._versions = Counter()
+        self._cond = threading.Condition()
+        self.mismatches = deque(maxlen=max_mismatches)
+        self._thread = threading.Thread(target=self._run, name="summary-reconcile", daemon=True)
+        self._thread.start()
+
+    def apply(self, key, transactions):
+        """Áp dụng giao dịch vào báo cáo đã cache của key, trả về False nếu key chưa có trong cache"""
+        with self._cond:
+            self._versions[key] += 1
+            updated = self.cache.update(key, lambda summary: apply_transactions(summary, transactions))
+            if updated is None:
+                return False
+            self._due.setdefault(key, time.monotonic() + self.delay)
+            self._cond.notify()
+            return True
+
+    def last_mismatch(self, key):
+        """Lần lệch gần nhất của key (None nếu chưa từng lệch)"""
+        for mismatch in reversed(self.mismatches):
+            if mismatch["key"] == key:
+                return mismatch
+        return None
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._due)
+
+    def _next_due(self):
+        """Chờ đến lượt đối chiếu gần nhất, trả về (key, version)"""
+        with self._cond:
+            while True:
+                if not self._due:
+                    self._cond.wait()
+                    continue
+                key, due_at = min(self._due.items(), key=lambda item: item[1])
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                del self._due[key]
+                return key, self._versions[key]
+
+    def reconcile(self, key, version):
+        """Tải báo cáo của server và so với bản tại máy, trả về 'match'/'mismatch'/'error'/'retry'"""
+        try:
+            success, server = self._fetch(key)
+        except Exception:
+            success = False
+        if not success or server.get("stale"):
+            return "error"
+
+        with self._cond:
+            if self._versions[key] != version:
+                # Có giao dịch mới trong lúc tải: đối chiếu lại sau
+                self._due.setdefault(key, time.monotonic() + self.delay)
+                return "retry"
+            local = self.cache.get_stale(key)
+            self.cache.set(key, server)
+
+        diff = summary_diff(local, server) if local is not None else {}
+        if diff:
+            self.mismatches.append({"key": key, "at": time.time(), "diff": diff})
+        return "mismatch" if diff else "match"
+
+    def _run(self):
+        while True:
+            key, version = self._next_due()
+            result = self.reconcile(key, version)
+            if self._on_result and result != "retry":
+                self._on_result(result)
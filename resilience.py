@@ -0,0 +1,177 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Mã HTTP được coi là lỗi tạm thời, có thể thử lại
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker đang mở: endpoint đang lỗi nên không gửi request"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Circuit breaker đang mở, thử lại sau {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class RetryBudget:
+    """Giới hạn retry trong process: mỗi request nạp `ratio` token, mỗi retry tiêu 1 token"""
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Lấy 1 token để retry, trả về False nếu đã hết ngân sách"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            return self._tokens
+
+
+class CircuitBreaker:
+    """Mở mạch sau nhiều lỗi liên tiếp, cho một request thử sau reset_timeout giây"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def retry_in(self):
+        """Số giây còn lại trước khi cho phép request thử"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def allow(self):
+        """Có được gửi request không (khi half-open chỉ cho một request thử)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def parse_retry_after(value):
+    """Đọc header Retry-After (số giây hoặc HTTP-date), trả về số giây hoặc None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Chính sách retry dùng chung: backoff mũ có jitter, tôn trọng Retry-After,
+    ngân sách retry theo process và circuit breaker"""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0,
+                 budget=None, breaker=None, sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._random = random.Random()
+
+    def backoff(self, attempt, retry_after=None):
+        """Thời gian chờ trước lần thử thứ attempt + 1 (full jitter)"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def execute(self, request, retry_exceptions=(), on_retry=None):
+        """Gọi request() và thử lại khi lỗi tạm thời.
+
+        Trả về response cuối cùng (có thể vẫn là mã lỗi) hoặc ném exception của lần thử
+        cuối; ném CircuitOpenError nếu breaker đang mở.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.retry_in())
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            error = None
+            response = None
+            try:
+                response = request()
+            except retry_exceptions as e:
+                error = e
+            except BaseException:
+                # Lỗi không retry vẫn phải được ghi nhận để giải phóng lượt thử khi half-open
+                self.breaker.record_failure()
+                raise
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return response
+
+            self.breaker.record_failure()
+            attempt += 1
+            if (attempt >= self.max_attempts or
+                    self.breaker.state == CircuitBreaker.OPEN or
+                    not self.budget.withdraw()):
+                if error is not None:
+                    raise error
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            delay = self.backoff(attempt - 1, retry_after)
+            if on_retry:
+                on_retry(delay)
+            self._sleep(delay)
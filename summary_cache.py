@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SummaryCache:
+    """Cache báo cáo dùng chung trong process, có TTL và giới hạn kích thước (LRU)"""
+
+    def __init__(self, ttl=300, max_size=32):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Lấy dữ liệu còn hạn theo key, trả về None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if time.time() - stored_at >= self.ttl:
+                # Giữ lại bản hết hạn để dùng tạm khi server lỗi (get_stale)
+                self.misses += 1
+                return None
+
+            # Đánh dấu vừa được dùng để không bị loại bỏ sớm
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def contains(self, key):
+        """Key có dữ liệu còn hạn không (không tính vào thống kê hit/miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry[1] < self.ttl
+
+    def get_stale(self, key):
+        """Lấy dữ liệu của key kể cả khi đã hết hạn (dùng khi không gọi được server)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value):
+        """Lưu dữ liệu vào cache, loại bỏ mục ít dùng nhất nếu vượt giới hạn"""
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def update(self, key, func):
+        """Thay dữ liệu của key bằng func(dữ liệu cũ), giữ nguyên thời điểm lưu.
+
+        Trả về dữ liệu mới, hoặc None nếu key không có trong cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value = func(entry[0])
+            self._entries[key] = (value, entry[1])
+            return value
+
+    def timestamp(self, key):
+        """Thời điểm dữ liệu của key được lưu vào cache (None nếu không có)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def expire(self, key):
+        """Đánh dấu dữ liệu của key đã hết hạn nhưng vẫn giữ lại (để hỏi server bằng version)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], 0.0)
+
+    def invalidate(self, key):
+        """Xóa dữ liệu của một key"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Thống kê số lần hit/miss và số mục đang lưu"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,121 @@
+import base64
+import gzip
+import json
+import threading
+import time
+import zlib
+
+# Các định dạng rút gọn mà client biết dùng (server báo lại qua action get_capabilities)
+WIRE_CAPABILITIES = ["gzip", "columns"]
+
+
+def rows_to_columns(rows):
+    """Danh sách object -> mỗi trường một mảng: {"date": [...], "amount": [...], ...}"""
+    fields = list(dict.fromkeys(field for row in rows for field in row))
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def columns_to_rows(columns):
+    """Ngược lại của rows_to_columns"""
+    fields = list(columns)
+    return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _envelope(action, raw):
+    return {
+        "action": action,
+        "encoding": "gzip",
+        "payload": base64.b64encode(gzip.compress(raw, compresslevel=6)).decode("ascii")
+    }
+
+
+def pack(data):
+    """Nén JSON bằng gzip và bọc trong phong bì {"encoding": "gzip", "payload": base64}.
+
+    Apps Script chỉ nhận và trả về văn bản, không đọc được header Content-Encoding,
+    nên dữ liệu nén được gửi dạng base64 bên trong JSON.
+    """
+    return _envelope(data.get("action"), dumps(data).encode("utf-8"))
+
+
+def unpack(message):
+    """Mở phong bì gzip nếu có, nếu không trả về nguyên message"""
+    if not isinstance(message, dict) or message.get("encoding") != "gzip":
+        return message
+    try:
+        return json.loads(gzip.decompress(base64.b64decode(message["payload"])))
+    except (KeyError, OSError, EOFError, zlib.error) as e:
+        # base64/JSON lỗi đã là ValueError; đưa lỗi gzip về cùng loại cho nơi gọi
+        raise ValueError(f"Payload nén không hợp lệ: {e}") from e
+
+
+class WireCodec:
+    """Mã hóa request / giải mã response theo định dạng server hỗ trợ.
+
+    Lần đầu cần, client hỏi server bằng get_capabilities; server cũ không trả về
+    capabilities thì mọi request giữ nguyên JSON thường. Nếu không hỏi được (lỗi mạng),
+    lần sau sẽ hỏi lại sau `retry_after` giây.
+    """
+
+    def __init__(self, fetch_capabilities, enabled=True, min_gzip_bytes=1024, retry_after=60.0):
+        # fetch_capabilities() -> danh sách định dạng server hỗ trợ
+        self._fetch_capabilities = fetch_capabilities
+        self.enabled = enabled
+        self.min_gzip_bytes = min_gzip_bytes
+        self.retry_after = retry_after
+        self._capabilities = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def capabilities(self):
+        if not self.enabled:
+            return set()
+        with self._lock:
+            if self._capabilities is not None:
+                return self._capabilities
+            if time.monotonic() < self._retry_at:
+                return set()
+            self._retry_at = time.monotonic() + self.retry_after
+        try:
+            supported = set(self._fetch_capabilities()) & set(WIRE_CAPABILITIES)
+        except Exception:
+            return set()
+        with self._lock:
+            self._capabilities = supported
+        return supported
+
+    def reset(self):
+        with self._lock:
+            self._capabilities = None
+            self._retry_at = 0.0
+
+    def encode(self, data):
+        """Dữ liệu request -> body gửi đi (bảng cột, nén gzip nếu server hỗ trợ và đủ lớn)"""
+        supported = self.capabilities()
+        if not supported:
+            return dumps(data).encode("utf-8")
+
+        data = dict(data)
+        if "columns" in supported:
+            if data.get("action") == "add_transactions" and "transactions" in data:
+                data["columns"] = rows_to_columns(data.pop("transactions"))
+            elif data.get("action") == "get_transactions":
+                data["format"] = "columns"
+        if "gzip" in supported:
+            data["accept_encoding"] = "gzip"
+        raw = dumps(data).encode("utf-8")
+        if "gzip" in supported and len(raw) >= self.min_gzip_bytes:
+            return dumps(_envelope(data.get("action"), raw)).encode("utf-8")
+        return raw
+
+    def decode(self, message):
+        """Body JSON nhận về -> dữ liệu response dạng thường (danh sách giao dịch theo dòng)"""
+        message = unpack(message)
+        if isinstance(message, dict) and "columns" in message and "transactions" not in message:
+            message = dict(message)
+            message["transactions"] = columns_to_rows(message.pop("columns"))
+        return message
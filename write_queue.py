@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteQueue:
+    """Hàng đợi ghi: gộp các giao dịch đang chờ thành một request theo từng (URL deploy, sheet)"""
+
+    def __init__(self, send_batch, max_batch_size=20, max_wait=0.5):
+        # send_batch(sheet_name, transactions, sheet_url) -> list[(thành công, thông báo)]
+        self._send_batch = send_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._oldest = None
+        self._flush_requested = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._worker.start()
+
+    def submit(self, sheet_name, transaction, sheet_url):
+        """Thêm một giao dịch gửi đến sheet_url vào hàng đợi, trả về Future chứa (thành công, thông báo)"""
+        future = Future()
+        with self._cond:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((sheet_url, sheet_name, transaction, future))
+            self._cond.notify()
+        return future
+
+    def flush(self):
+        """Yêu cầu gửi ngay các giao dịch đang chờ"""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+
+    def pending_count(self):
+        """Số giao dịch đang chờ gửi"""
+        with self._cond:
+            return len(self._pending)
+
+    def _take_ready(self):
+        """Chờ đến khi đủ kích thước batch, hết thời gian chờ hoặc có yêu cầu flush"""
+        with self._cond:
+            while True:
+                if self._pending:
+                    waited = time.monotonic() - self._oldest
+                    if (len(self._pending) >= self.max_batch_size or
+                            waited >= self.max_wait or
+                            self._flush_requested):
+                        break
+                    self._cond.wait(self.max_wait - waited)
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+
+            items, self._pending = self._pending, []
+            self._oldest = None
+            self._flush_requested = False
+            return items
+
+    def _run(self):
+        while True:
+            items = self._take_ready()
+
+            # Gom theo URL deploy và sheet, mỗi request tối đa max_batch_size giao dịch
+            by_sheet = {}
+            for sheet_url, sheet_name, transaction, future in items:
+                by_sheet.setdefault((sheet_url, sheet_name), []).append((transaction, future))
+
+            for (sheet_url, sheet_name), entries in by_sheet.items():
+                for i in range(0, len(entries), self.max_batch_size):
+                    chunk = entries[i:i + self.max_batch_size]
+                    self._send_chunk(sheet_url, sheet_name, chunk)
+
+    def _send_chunk(self, sheet_url, sheet_name, chunk):
+        futures = [future for _, future in chunk]
+        try:
+            results = self._send_batch(sheet_name, [transaction for transaction, _ in chunk], sheet_url)
+        except Exception as e:
+            results = [(False, f"❌ Lỗi không xác định: {str(e)[:100]}")] * len(chunk)
+
+        if len(results) < len(chunk):
+            results = list(results) + [(False, "❌ Server không trả về kết quả cho giao dịch")] * (len(chunk) - len(results))
+
+        for future, result in zip(futures, results):
+            future.set_result(result)